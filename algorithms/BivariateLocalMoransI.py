@@ -0,0 +1,109 @@
+"""
+***************************************************************************
+    BivariateLocalMoransI.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterFeatureSink,
+                          QgsProcessingParameterEnum,
+                          QgsMessageLog,
+                          Qgis)
+import pandas as pd
+from .weights import METHODS, buildWeights, methodDescription
+from .lisa import bivariateMoran
+from .layerio import readLayer, outputLayer
+
+class BivariateLocalMoransI(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    VARIABLE = 'VARIABLE'
+    LAGGED = 'LAGGED'
+    METHOD = 'METHOD'
+    KNN_DIST = 'KNN_DIST'
+    PERMUTATIONS = 'PERMUTATIONS'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint], defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.VARIABLE, 'Variable X', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT))
+        self.addParameter(QgsProcessingParameterField(self.LAGGED, 'Variables Y (spatially lagged)', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
+        self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = METHODS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.KNN_DIST, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterNumber(self.PERMUTATIONS, type = QgsProcessingParameterNumber.Integer,description='Permutations', defaultValue = 999, minValue = 99))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Bivariate Local Morans I', createByDefault=True, supportsAppend=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        field = self.parameterAsString(parameters, self.VARIABLE, context)
+        lagged = self.parameterAsFields(parameters, self.LAGGED, context)
+        method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
+        knn_dist = self.parameterAsDouble(parameters, self.KNN_DIST, context)
+        permutations = self.parameterAsInt(parameters, self.PERMUTATIONS, context)
+
+        layer = layerSource
+        if layer.geometryType() == 0 and (method == 0 or method == 1):
+            return  {'Error':'This method is not available with point layers'}
+        if len(lagged) == 0:
+            return {'Error':'At least one Y variable is required'}
+
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layer)
+
+        # Create spatial weights (row standardized in bivariateMoran)
+        w = buildWeights(data, method, knn_dist)
+
+        # All pairs at once: one sparse product W @ Y and shared permutation draws
+        BVI, BVP, BVQ = bivariateMoran(data[field].to_numpy(dtype=float), data[lagged].to_numpy(dtype=float), w.sparse, permutations)
+
+        # Join results, BV<k>_I / BV<k>_P / BV<k>_Q for the k-th Y variable
+        cols = {}
+        for k, fld in enumerate(lagged):
+            cols['BV{}_I'.format(k+1)] = BVI[:, k]
+            cols['BV{}_P'.format(k+1)] = BVP[:, k]
+            cols['BV{}_Q'.format(k+1)] = BVQ[:, k]
+        data = data.join(pd.DataFrame(cols))
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, data, layer.crs(), 'Bivariate Local Morans I')
+
+        # Log Messages
+        QgsMessageLog.logMessage('===== Bivariate Local Morans I =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layer: '+str(layerSource.sourceName()), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Variable X: '+str(field), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Method: '+methodDescription(method, knn_dist), "Spatial Analysis Toolbox", level=Qgis.Info)
+        for k, fld in enumerate(lagged):
+            QgsMessageLog.logMessage('BV{}: Y = {}'.format(k+1, fld), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return {self.OUTPUT: dest_id, 'Pairs': ', '.join('BV{} = {}'.format(k+1, fld) for k, fld in enumerate(lagged))}
+
+    def name(self):
+        return 'bivariatelocalmoransi'
+
+    def displayName(self):
+        return 'Bivariate Local Moran\'s I'
+
+    def shortHelpString(self):
+        return ("Bivariate Local Moran's I of variable X against the spatial lag of one or more Y variables. \n"
+        		"All X - Y pairs are calculated in a single run. For the k-th Y variable the output fields are BV<k>_I (index), BV<k>_P (p-value) and BV<k>_Q (category 1 HH, 2 LH, 3 LL, 4 HL).\n"
+        		"The methods for the neighbors are the same as in Local Moran's I:\n"
+        		"- Queen / Rook contiguity (works only for polygon layers).\n"
+        		"- K Nearest Neighbors (works with point/polygon* layers).\n"
+       			"- Distance Band (works with point/polygon* layers).\n"
+      			"*In KNN and Distance Band, polygon layers are handled based on their centroids.")
+
+    def createInstance(self):
+        return BivariateLocalMoransI()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
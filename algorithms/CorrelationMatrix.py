@@ -15,22 +15,44 @@ from qgis.core import (QgsProcessing,
                       QgsProcessingParameterNumber,
                       QgsMessageLog,
                       QgsProcessingParameterEnum,
+                      QgsProcessingParameterBoolean,
+                      QgsProcessingParameterMultipleLayers,
+                      QgsProcessingParameterFeatureSink,
                       Qgis)
-import processing
 import os, tempfile
 import numpy as np
-import geopandas as gpd
 import pandas as pd
+from .cache import cacheKey, cacheLookup, cacheStore
+from .layerio import readLayer, attributeFile, removeTemp, outputTable, isArrowPath, featureChunks
+from .batch import correlationRows, matrixRows, correlationFileRows, runBatch, resultsTable, CORRELATION_COLUMNS
+from .parallel import processPool, workerCount
+from .streaming import streamFile, streamChunks
 
 class CorrelationMatrix(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
     FIELDS = 'FIELDS'
     METHOD = 'METHOD'
+    CACHE = 'CACHE'
+    CACHE_SIZE = 'CACHE_SIZE'
+    LAYERS = 'LAYERS'
+    METHODS = 'METHODS'
+    WORKERS = 'WORKERS'
+    TABLE = 'TABLE'
+    STREAMING = 'STREAMING'
+    CHUNK_SIZE = 'CHUNK_SIZE'
     
     def initAlgorithm(self, config=None):
         self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input Layer', defaultValue=None))
         self.addParameter(QgsProcessingParameterField(self.FIELDS, 'Independent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
         self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = ['Pearson', 'Kendall', 'Spearman'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(self.CACHE, 'Reuse cached results of identical runs', defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.CACHE_SIZE, type = QgsProcessingParameterNumber.Integer,description='Cache size limit (MB)', defaultValue = 1024, minValue = 1))
+        self.addParameter(QgsProcessingParameterMultipleLayers(self.LAYERS, 'Additional layers (batch)', layerType=QgsProcessing.TypeVector, optional=True))
+        self.addParameter(QgsProcessingParameterEnum(self.METHODS, 'Additional methods (batch)', options = ['Pearson', 'Kendall', 'Spearman'], allowMultiple=True, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes (batch / streaming chunk readers, 0 = all cores)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterBoolean(self.STREAMING, 'Streaming (Pearson by chunks of features, for very large layers)', defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.CHUNK_SIZE, type = QgsProcessingParameterNumber.Integer,description='Features per chunk (streaming)', defaultValue = 100000, minValue = 1))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.TABLE, 'Results table', type=QgsProcessing.TypeVector, createByDefault=False, optional=True, defaultValue=None))
 
 
     def processAlgorithm(self, parameters, context, model_feedback):
@@ -38,6 +60,13 @@ class CorrelationMatrix(QgsProcessingAlgorithm):
         layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         fields = self.parameterAsFields(parameters, self.FIELDS, context)
         method = self.parameterAsInt(parameters, self.METHOD, context)
+        useCache = self.parameterAsBool(parameters, self.CACHE, context)
+        cacheSize = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        extraLayers = self.parameterAsLayerList(parameters, self.LAYERS, context)
+        extraMethods = self.parameterAsEnums(parameters, self.METHODS, context)
+        workers = workerCount(self.parameterAsInt(parameters, self.WORKERS, context))
+        streaming = self.parameterAsBool(parameters, self.STREAMING, context)
+        chunkSize = self.parameterAsInt(parameters, self.CHUNK_SIZE, context)
         layer = layerSource
         
         results = {}
@@ -45,26 +74,55 @@ class CorrelationMatrix(QgsProcessingAlgorithm):
         # No correlation can be calculated for less that 2 fields
         if len(fields) < 2:
             return {'Error': 'Cannot calculate correlation for less that 2 fields'}
+
+        # More than one layer or method -> batch run, one row per layer x pair of fields x method
+        layers = [layer] + [l for l in extraLayers if l.id() != layer.id()]
+        methods = [method] + [m for m in extraMethods if m != method]
+        if streaming and (method != 0 or len(methods) > 1):
+            return {'Error': 'Streaming mode calculates only Pearson correlation'}
+        if streaming and len(layers) > 1:
+            return {'Error': 'Streaming mode calculates one layer per run'}
+        if len(layers) * len(methods) > 1:
+            return self.batch(parameters, context, model_feedback, layers, fields, methods, workers)
+
+        # Same data and parameters as a previous run -> stored results (not with a results table to write)
+        if useCache:
+            key = cacheKey(self.name(), dict({'method':method}, **({'streaming':True} if streaming else {})), layer, fields)
+            cached = cacheLookup(key) if parameters.get(self.TABLE) is None else None
+            if cached is not None:
+                results, files = cached
+                if 'plot' in files:
+                    results['3_Plot'] = files['plot']
+                results['Cache'] = 'hit'
+                QgsMessageLog.logMessage('===== Correlation (cached results) =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+                QgsMessageLog.logMessage('Layer: '+ str(layerSource.sourceName()), "Spatial Analysis Toolbox", level=Qgis.Info)
+                QgsMessageLog.logMessage('Correlation: ' + results['2_Correlation'], "Spatial Analysis Toolbox", level=Qgis.Info)
+                return results
         
-        # Vector layer to GeoDataFrame
-        tempDir = tempfile.gettempdir()
-        temp = os.path.join(tempDir, 'temp.shp')  # Path
-        processing.run("sat:clonelayer", {'INPUT':layer ,'OUTPUT':temp})
-        data = gpd.read_file(temp)
-        
-        # Keep fields needed
-        attr = data[fields]
-        
-        if method == 0: m = 'pearson'
-        elif method == 1: m = 'kendall'
-        elif method == 2: m = 'spearman'
- 
-        # Correlation Matrix
-        corr = attr.corr(method=m)
+        if streaming:
+            # Pearson from the co-moments of chunks of features, memory independent of the number of features
+            moments = self.stream(layer, fields, chunkSize, workers, model_feedback)
+            corr = pd.DataFrame(moments.correlation(), index=fields, columns=fields)
+            rows = matrixRows(layerSource.sourceName(), corr, moments.n, 'Pearson')
+        else:
+            # Vector layer to GeoDataFrame, only the fields needed (GeoParquet / Feather read directly)
+            data = readLayer(layer, fields)
+            attr = data[fields]
+            
+            if method == 0: m = 'pearson'
+            elif method == 1: m = 'kendall'
+            elif method == 2: m = 'spearman'
+     
+            # Correlation Matrix
+            corr = attr.corr(method=m)
+            rows = correlationRows(layerSource.sourceName(), attr, [method])
         
         # Results to return
         results['1_Fields'] = ' '.join(fields)
         results['2_Correlation'] = corr.to_string()
+        if streaming:
+            results['5_Features'] = moments.rows
+            results['6_Missing values'] = ', '.join('{}: {}'.format(f, m) for f, m in zip(fields, moments.missing()))
         results['4_Results'] = 'Check Log Messages for results' 
         
         # Plot (seaborn package needed)
@@ -94,9 +152,69 @@ class CorrelationMatrix(QgsProcessingAlgorithm):
         QgsMessageLog.logMessage('Fields: '+ results['1_Fields'], "Spatial Analysis Toolbox", level=Qgis.Info)
         QgsMessageLog.logMessage('Correlation: ' + results['2_Correlation'], "Spatial Analysis Toolbox", level=Qgis.Info)
         QgsMessageLog.logMessage('Plot: ' + results['3_Plot'], "Spatial Analysis Toolbox", level=Qgis.Info)
+        if streaming:
+            QgsMessageLog.logMessage('Streaming: {} features, missing values {}'.format(results['5_Features'], results['6_Missing values']), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        if useCache:
+            cacheStore(key, results, {'plot': results['3_Plot']} if os.path.exists(results['3_Plot']) else None, cacheSize)
+            results['Cache'] = 'miss'
+
+        # Results table, one row per pair of fields
+        tableId = outputTable(self, parameters, self.TABLE, context, resultsTable(rows, CORRELATION_COLUMNS))
+        if tableId is not None:
+            results[self.TABLE] = tableId
         
         return results
 
+    def stream(self, layer, fields, chunkSize, workers, feedback):
+        """Co-moments of the fields, by chunks of features.
+
+        GeoParquet / Feather files are read directly, their row groups / record
+        batches split among parallel chunk readers; other layers are iterated
+        through QGIS, one chunk of features at a time.
+        """
+        path = layer.source().split('|')[0]
+        if layer.providerType() == 'ogr' and isArrowPath(path) and not layer.subsetString():
+            if workers > 1:
+                with processPool(workers) as pool:
+                    return streamFile(path, fields, chunkSize, pool, workers, feedback)
+            return streamFile(path, fields, chunkSize, feedback=feedback)
+        return streamChunks(featureChunks(layer, fields, chunkSize), len(fields), feedback, layer.featureCount())
+
+    def batch(self, parameters, context, feedback, layers, fields, methods, workers):
+        """Correlations of every layer x pair of fields x method, the layers in parallel in the worker processes."""
+        tasks = []
+        try:
+            for layer in layers:
+                # Fields missing from a layer are skipped
+                present = [f for f in fields if layer.fields().indexOf(f) >= 0]
+                if len(present) < len(fields):
+                    feedback.reportError('{}: no field {}, skipped'.format(layer.sourceName(), ', '.join(f for f in fields if f not in present)))
+                if len(present) >= 2:
+                    # Attributes exported here (QGIS), the workers only read files
+                    tasks.append((attributeFile(layer, present), layer.sourceName(), present, methods))
+            if not tasks:
+                return {'Error': 'No layer with at least 2 of the fields'}
+
+            feedback.pushInfo('{} layers, {} workers'.format(len(tasks), min(workers, len(tasks))))
+            table = resultsTable(runBatch(correlationFileRows, tasks, workers, feedback), CORRELATION_COLUMNS)
+        finally:
+            # Temp files of the non GeoParquet / Feather layers
+            removeTemp([task[0] for task in tasks])
+
+        results = {}
+        tableId = outputTable(self, parameters, self.TABLE, context, table)
+        if tableId is not None:
+            results[self.TABLE] = tableId
+        results['1_Layers'] = len(tasks)
+        results['2_Rows'] = len(table)
+        results['3_Results table'] = table.round(5).to_string()
+
+        QgsMessageLog.logMessage('===== Correlation (batch) =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layers: {}, fields: {}, methods: {}'.format(len(tasks), ' '.join(fields), len(methods)), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('\n' + results['3_Results table'], "Spatial Analysis Toolbox", level=Qgis.Info)
+        return results
+
     def name(self):
         return 'correlation'
 
@@ -104,7 +222,7 @@ class CorrelationMatrix(QgsProcessingAlgorithm):
         return 'Correlation Matrix'
     
     def shortHelpString(self):
-        return ("Correlation matrix supports Pearson, Kendal and Spearman correlation. \n Also, the algorithm saves a plotted correlation heatmap (seaborn python package required)")
+        return ("Correlation matrix supports Pearson, Kendal and Spearman correlation. \n Also, the algorithm saves a plotted correlation heatmap (seaborn python package required). \n With the result cache, a run with the same field values, geometries and method as a previous one returns the stored results (Cache: hit). \n Optionally the correlations are also written to a results table, one row per pair of fields. \n Batch: with additional layers or methods, the correlations of every layer x pair of fields x method are written to the table, the layers in parallel in worker processes (fields missing from a layer are skipped). \n Streaming (Pearson only): for layers too large for memory, the features are read in chunks and the means, co-moments and counts of every pair of fields (rows where both are present, as the in-memory method) are accumulated and merged with a numerically stable update, so the correlations are exact and the memory does not depend on the number of features. GeoParquet / Feather files are read by parallel chunk readers (row groups / record batches), other layers feature by feature through QGIS. The missing values per field are reported.")
     
     def createInstance(self):
         return CorrelationMatrix()
@@ -13,15 +13,11 @@ from qgis.core import    (QgsProcessing,
                           QgsProcessingParameterVectorLayer,
                           QgsProcessingParameterField,
                           QgsProcessingParameterString,
-                          QgsFeatureSink,
                           QgsProcessingParameterFeatureSink,
-                          QgsVectorLayer,
                           Qgis)
 
-import processing
-import os, tempfile, random, string
-import geopandas as gpd
 import pandas as pd
+from .layerio import readLayer, outputLayer
 
 class DummyVariables(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
@@ -43,34 +39,16 @@ class DummyVariables(QgsProcessingAlgorithm):
         
         layer = layerSource
 
-        # Get temp path
-        randExt = ''.join(random.choice(string.ascii_lowercase) for i in range(5))
-        temp = os.path.join(tempfile.gettempdir(), 'temp_{}.shp'.format(randExt))  # Path
-        
-        # Create a temp layer
-        temp = os.path.join(tempfile.gettempdir(), 'temp.shp')  # Path
-
-        # Read shp as geodataframe
-        processing.run("script:clonelayer", {'INPUT':layer, 'OUTPUT':temp})['OUTPUT']
-        data = gpd.read_file(temp)
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layer)
         
         
         column = data[field]    # This is the original field
         data = pd.get_dummies(data=data, prefix=prefix, columns=[field])
         data = df = pd.concat([data, column], axis=1)   # pd.get_dummies deletes the original field, so this way it is joined back
 
-        # Output
-        outPath = os.path.join(tempfile.gettempdir(), 'temp_dummies_{}.shp'.format(randExt))
-        data.to_file(outPath)
-        vectorLayer = QgsVectorLayer(outPath,"DummyVariables","ogr")
-        vectorLayer.setCrs(layer.crs())
-
-        # Output & Load to QGIS
-        source = vectorLayer
-        (sink, self.dest_id) = self.parameterAsSink(parameters, self.OUTPUT , context , source.fields() , source.wkbType() ,source.sourceCrs())
-        features = source.getFeatures()
-        for current, feature in enumerate(features):
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        self.dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, data, layer.crs(), 'Dummy Variables')
         return {self.OUTPUT: self.dest_id}
 
     def name(self):
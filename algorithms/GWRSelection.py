@@ -0,0 +1,181 @@
+"""
+***************************************************************************
+    GWRSelection.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterEnum,
+                          QgsProcessingParameterFeatureSink,
+                          QgsMessageLog,
+                          Qgis)
+import pandas as pd
+import numpy as np
+import contextlib, io
+from mgwr.gwr import GWR
+from .layerio import readLayer, outputLayer, outputTable
+from .weights import pointCoordinates
+from .parallel import processPool, workerCount
+from .selection import initSelection, forwardSelection, exhaustiveSelection, subsetCount, rankModels
+
+class GWRSelection(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    DEP = 'DEP'
+    INDEP = 'INDEP'
+    KERNEL = 'KERNEL'
+    FIXED = 'FIXED'
+    BW = 'BW'
+    CONSTANT = 'CONSTANT'
+    SEARCH = 'SEARCH'
+    MAX_VARS = 'MAX_VARS'
+    MAX_MODELS = 'MAX_MODELS'
+    WORKERS = 'WORKERS'
+    KERNEL_CACHE = 'KERNEL_CACHE'
+    OUTPUT = 'OUTPUT'
+    MODELS = 'MODELS'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint],  defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.INDEP, 'Candidate Independent Variables', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
+        self.addParameter(QgsProcessingParameterField(self.DEP, 'Dependent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=False, defaultValue=''))
+        self.addParameter(QgsProcessingParameterEnum(self.KERNEL, 'Kernel Method', options = ['Gaussian', 'Bisquare', 'Exponential'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(self.FIXED, 'Kernel Type', options = ['Adaptive - NN', 'Distance based'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.BW, type = QgsProcessingParameterNumber.Integer,description='Bandwidth (0 for auto selection per model)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterEnum(self.CONSTANT, 'Calculate constant', options = ['True', 'False'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(self.SEARCH, 'Search', options = ['Forward stepwise', 'Exhaustive'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.MAX_VARS, type = QgsProcessingParameterNumber.Integer,description='Max variables per model (0 = all candidates)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.MAX_MODELS, type = QgsProcessingParameterNumber.Integer,description='Max models of the exhaustive search', defaultValue = 1000, minValue = 1))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes (0 = all cores)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.KERNEL_CACHE, type = QgsProcessingParameterNumber.Integer,description='Kernel cache per process (MB)', defaultValue = 1024, minValue = 0))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'GWR (best model)', createByDefault=True, supportsAppend=False, defaultValue=None))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.MODELS, 'Ranked models', type=QgsProcessing.TypeVector, createByDefault=False, optional=True, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        yField = self.parameterAsFields(parameters, self.DEP, context)[0]
+        xFields = self.parameterAsFields(parameters, self.INDEP, context)
+        kernel = self.parameterAsInt(parameters, self.KERNEL, context)
+        fixed = self.parameterAsInt(parameters, self.FIXED, context)
+        bw = self.parameterAsInt(parameters, self.BW, context)
+        constant = self.parameterAsInt(parameters, self.CONSTANT, context)
+        search = self.parameterAsInt(parameters, self.SEARCH, context)
+        maxVars = self.parameterAsInt(parameters, self.MAX_VARS, context)
+        maxModels = self.parameterAsInt(parameters, self.MAX_MODELS, context)
+        workers = workerCount(self.parameterAsInt(parameters, self.WORKERS, context))
+        cacheSize = self.parameterAsInt(parameters, self.KERNEL_CACHE, context)
+
+        if yField in xFields:
+            return {'Error':'A variable cannot be both Dependent and Independent'}
+        k = len(xFields)
+        maxVars = k if maxVars == 0 else min(maxVars, k)
+        if search == 1 and subsetCount(k, maxVars) > maxModels:
+            return {'Error':'The exhaustive search needs {} models, more than the limit of {}'.format(subsetCount(k, maxVars), maxModels)}
+
+        data = readLayer(layerSource)
+
+        # Array with coords (centroids for polygons) and the candidate pool
+        coords = pointCoordinates(data)
+        X = data[xFields].to_numpy(dtype=float)
+        y = data[yField].to_numpy(dtype=float).reshape((-1,1))
+
+        # Parameters
+        kernel = ['gaussian', 'bisquare', 'exponential'][kernel]
+        fixed = fixed == 1
+        constant = constant == 0
+        # Great circle distances (km) for geographic CRSs, coords are lon / lat
+        spherical = layerSource.crs().isGeographic()
+
+        # Candidate models in the process pool, every worker keeps its kernels for all the models it evaluates
+        settings = (coords, X, y, kernel, fixed, constant, spherical, cacheSize * 1024 * 1024)
+        select = exhaustiveSelection if search == 1 else forwardSelection
+        if workers > 1:
+            with processPool(workers, initSelection, settings) as pool:
+                evaluated = select(k, maxVars, bw, pool, model_feedback)
+        else:
+            initSelection(*settings)
+            evaluated = select(k, maxVars, bw, None, model_feedback)
+        if model_feedback.isCanceled():
+            return {}
+        table = rankModels(evaluated, xFields)
+        bestColumns, bestBW, bestAICc = min(evaluated, key=lambda s: s[2])
+        bestFields = [xFields[j] for j in bestColumns]
+        model_feedback.setProgress(80)
+
+        # Best model, fitted as in GWR
+        cols = ['X{}_{}'.format(str(i+1),str(fld)) for i, fld in enumerate(bestFields)]
+        t_stats = ['X{}_t-test'.format(str(i+1)) for i in range(len(bestFields))]
+        if constant:
+            cols.insert(0, 'X0_Const')
+            t_stats.insert(0,'X0_t-test')
+        bestBW = int(bestBW) if not fixed and np.isfinite(bestBW) else bestBW
+        res = GWR(coords, y, X[:, list(bestColumns)], bw = bestBW, fixed=fixed, kernel=kernel, constant=constant, spherical=spherical).fit()
+        summary = io.StringIO()
+        with contextlib.redirect_stdout(summary):
+            res.summary()
+        summary = summary.getvalue()
+
+        gwr = data.join(pd.DataFrame(res.params, columns = cols))
+        gwr = gwr.join(pd.DataFrame(res.predy, columns = ['predY']))
+        gwr = gwr.join(pd.DataFrame(res.localR2, columns = ['localR2']))
+        gwr = gwr.join(pd.DataFrame(res.resid_response, columns = ['residuals']))
+        gwr = gwr.join(pd.DataFrame(res.tvalues, columns = t_stats))
+        allCols = cols + t_stats + ['predY', 'localR2', 'residuals']
+        gwr.loc[:, allCols] = gwr[allCols].round(4)
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, gwr, layerSource.crs(), 'GWR')
+
+        # Results
+        results = {self.OUTPUT: dest_id}
+        modelsId = outputTable(self, parameters, self.MODELS, context, table)
+        if modelsId is not None:
+            results[self.MODELS] = modelsId
+        results['1_Search'] = '{}, {} models evaluated'.format(['Forward stepwise', 'Exhaustive'][search], len(table))
+        results['2_Best model'] = ', '.join(bestFields)
+        results['3_Bandwidth'] = round(bestBW, 3)
+        results['4_AICc'] = round(bestAICc, 3)
+        results['5_R2'] = round(res.R2, 3)
+        results['6_Models'] = table.round(3).to_string()
+
+        QgsMessageLog.logMessage('===== GWR Model Selection =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layer: '+str(layerSource.sourceName()), "Spatial Analysis Toolbox", level=Qgis.Info)
+        for key in ['1_Search', '2_Best model', '3_Bandwidth', '4_AICc', '5_R2']:
+            QgsMessageLog.logMessage('{}: {}'.format(key[2:], results[key]), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Models:\n' + results['6_Models'], "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage(summary, "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return results
+
+    def name(self):
+        return 'gwrselection'
+
+    def displayName(self):
+        return 'GWR Model Selection'
+
+    def shortHelpString(self):
+        return ("Selection of the independent variables of a Geographically Weighted Regression from a pool of candidates, by AICc. \n"
+        		"- Forward stepwise: starting from the best single variable, the variable that lowers the AICc most is added, until none does (or the max variables are reached).\n"
+        		"- Exhaustive: every subset of up to the max variables, within the max number of models.\n"
+        		"With bandwidth 0, the bandwidth of every candidate model is selected (golden section, AICc) as in GWR. "
+        		"The candidate models are evaluated in worker processes, and every process caches the kernels of the bandwidths it visits, "
+        		"so the distances and kernels are reused across the models instead of being recomputed for each.\n"
+        		"The results include the ranked table of the models (AICc and difference to the best one), optionally also written to a table (one row per model, best first), "
+        		"and the output layer is the best model fitted as in GWR. "
+        		"Polygon layers are handled based on their centroids; for layers in a geographic CRS the kernels use great circle distances (km).")
+
+    def createInstance(self):
+        return GWRSelection()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
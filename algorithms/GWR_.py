@@ -16,17 +16,19 @@ from qgis.core import    (QgsProcessing,
                           QgsProcessingParameterNumber,
                           QgsProcessingParameterEnum,
                           QgsProcessingParameterFeatureSink,
-                          QgsFeatureSink,
-                          QgsVectorLayer,
                           QgsMessageLog,
                           Qgis)
-import geopandas as gpd
 import pandas as pd
 import numpy as np
 from mgwr.gwr import GWR
 from mgwr.sel_bw import Sel_BW
-import os, tempfile, sys, io
-import processing
+import os, sys, io
+from .cache import cacheKey, cacheLookup, cacheStore
+from .layerio import readLayer, outputLayer, tempPath, removeTemp
+from .weights import pointCoordinates
+from .preflight import memoryBudget, estimateGWR, describe, formatBytes, start, compare
+from .parallel import processPool, workerCount
+from .stationarity import initStationarity, stationarityTest
 
 class GWR_(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
@@ -36,6 +38,11 @@ class GWR_(QgsProcessingAlgorithm):
     FIXED = 'FIXED'
     BW = 'BW'
     CONSTANT = 'CONSTANT'
+    CACHE = 'CACHE'
+    CACHE_SIZE = 'CACHE_SIZE'
+    MEMORY = 'MEMORY'
+    VARIABILITY = 'VARIABILITY'
+    WORKERS = 'WORKERS'
     OUTPUT = 'OUTPUT'
     
     def initAlgorithm(self, config=None):
@@ -46,6 +53,11 @@ class GWR_(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterEnum(self.FIXED, 'Kernel Type', options = ['Adaptive - NN', 'Distance based'], defaultValue=0))
         self.addParameter(QgsProcessingParameterNumber(self.BW, type = QgsProcessingParameterNumber.Integer,description='Bandwidth (0 for auto selection)', defaultValue = 0, minValue = 0))
         self.addParameter(QgsProcessingParameterEnum(self.CONSTANT, 'Calculate constant', options = ['True', 'False'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(self.CACHE, 'Reuse cached results of identical runs', defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.CACHE_SIZE, type = QgsProcessingParameterNumber.Integer,description='Cache size limit (MB)', defaultValue = 1024, minValue = 1))
+        self.addParameter(QgsProcessingParameterNumber(self.MEMORY, type = QgsProcessingParameterNumber.Integer,description='Memory budget (MB, 0 = 80% of the available memory)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.VARIABILITY, type = QgsProcessingParameterNumber.Integer,description='Spatial variability test: permutations (0 = no test)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes for the variability test (0 = all cores)', defaultValue = 0, minValue = 0))
         self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'GWR', createByDefault=True, supportsAppend=False, defaultValue=None))
 
     def processAlgorithm(self, parameters, context, model_feedback):
@@ -56,21 +68,42 @@ class GWR_(QgsProcessingAlgorithm):
         fixed = self.parameterAsInt(parameters, self.FIXED, context)
         bw =  self.parameterAsInt(parameters, self.BW, context)
         constant = self.parameterAsInt(parameters, self.CONSTANT, context)
+        useCache = self.parameterAsBool(parameters, self.CACHE, context)
+        cacheSize = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        budget = memoryBudget(self.parameterAsInt(parameters, self.MEMORY, context))
+        permutations = self.parameterAsInt(parameters, self.VARIABILITY, context)
+        workers = workerCount(self.parameterAsInt(parameters, self.WORKERS, context))
         
         if yField in xFields:
             return {'Error':'A variable cannot be both Dependent and Independent'}
-        
-        tempDir = tempfile.gettempdir()
-        temp = os.path.join(tempDir, 'temp.shp')  # Path
 
-        layer = processing.run("sat:clonelayer", {'INPUT':layerSource ,'OUTPUT':temp})['OUTPUT']
-        data = gpd.read_file(layer)
+        # Same data and parameters as a previous run -> stored model columns, joined to the current attributes, and summary
+        if useCache:
+            key = cacheKey(self.name(), {'y':yField, 'x':xFields, 'kernel':kernel, 'fixed':fixed, 'bw':bw, 'constant':constant, 'permutations':permutations}, layerSource, [yField] + xFields)
+            cached = cacheLookup(key)
+            if cached is not None and 'columns' in cached[1]:
+                stored, files = cached
+                gwr = readLayer(layerSource).join(pd.read_parquet(files['columns']))
+                dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, gwr, layerSource.crs(), 'GWR')
+                QgsMessageLog.logMessage(stored['summary'], "Spatial Analysis Toolbox", level=Qgis.Info)
+                QgsMessageLog.logMessage('Variables: {}'.format(stored['cols']), "Spatial Analysis Toolbox", level=Qgis.Info)
+                results = {'OUTPUT':dest_id, 'R2':stored['R2'], 'Results': 'Check Log Message for more', 'Cache': 'hit'}
+                if stored.get('variability'):
+                    QgsMessageLog.logMessage(stored['variability'], "Spatial Analysis Toolbox", level=Qgis.Info)
+                    results['Spatial variability'] = stored['variability']
+                return results
+
+        # Pre-flight estimate, refuse runs that would not fit in the memory budget
+        estimate = estimateGWR(layerSource.featureCount(), len(xFields) + (1 if constant == 0 else 0), bw == 0)
+        model_feedback.pushInfo('GWR estimate: ' + describe(estimate))
+        if budget is not None and estimate[0] > budget:
+            return {'Error':'GWR needs about {} of memory, more than the budget of {}'.format(formatBytes(estimate[0]), formatBytes(budget))}
+        started = start()
+        
+        data = readLayer(layerSource)
         
-        # List with coords
-        coords = []
-        for i in range(data.shape[0]):
-            coords.append([data.at[i,'geometry'].x,
-                           data.at[i,'geometry'].y])
+        # Array with coords (centroids for polygons)
+        coords = pointCoordinates(data)
 
         # Arrays with x variables
         arrays = []
@@ -99,8 +132,12 @@ class GWR_(QgsProcessingAlgorithm):
         elif fixed == 1: fixed = True
 
         # Kernel Bandwidth
-        if bw == 0:     # This is auto kernel bandwidth
-            bw = Sel_BW(coords, y, X, kernel=kernel, fixed=fixed)
+        # Great circle distances (km) for geographic CRSs, coords are lon / lat
+        spherical = layerSource.crs().isGeographic()
+
+        autoBandwidth = bw == 0
+        if autoBandwidth:     # This is auto kernel bandwidth
+            bw = Sel_BW(coords, y, X, kernel=kernel, fixed=fixed, spherical=spherical)
             bw = bw.search('golden_section', 'AICc')
         
         # Calculate constant
@@ -112,7 +149,7 @@ class GWR_(QgsProcessingAlgorithm):
             constant = False
 
         # Model
-        model = GWR(coords, y, X, bw = bw, fixed=fixed, kernel=kernel, constant=constant)
+        model = GWR(coords, y, X, bw = bw, fixed=fixed, kernel=kernel, constant=constant, spherical=spherical)
         res = model.fit()
         residuals = res.resid_response
         coeff = res.params
@@ -122,6 +159,12 @@ class GWR_(QgsProcessingAlgorithm):
 
         R2 = round(res.R2,3)
         
+        # Spatial variability test: the model refitted with permuted locations in the worker processes
+        variability = None
+        if permutations > 0:
+            variability = self.variabilityTest(coords, X, y, res.params.std(axis=0), 0 if autoBandwidth else bw,
+                                               kernel, fixed, constant, spherical, permutations, workers, budget, cols, model_feedback)
+
         # res.summary prints the summary
         # I want to pass it to a var so that I can pass it in Log Messages
         old_stdout = sys.stdout
@@ -141,26 +184,52 @@ class GWR_(QgsProcessingAlgorithm):
         allCols = cols + t_stats + ['predY', 'localR2', 'residuals']
         gwr.loc[:, allCols] = gwr[allCols].round(4)
         
-        # GeoDF -> shp
-        outPath = os.path.join(tempfile.gettempdir(), 'temp_gwr.shp')
-        gwr.to_file(outPath)
-        
-        # SHP-> QgsVectorLayer
-        vectorLayer = QgsVectorLayer(outPath,"mygeojson","ogr")
-        vectorLayer.setCrs(layerSource.crs())
-
-        # Output & Load to QGIS
-        source = vectorLayer
-        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT , context , source.fields() , source.wkbType() ,source.sourceCrs())
-        features = source.getFeatures()
-        for current, feature in enumerate(features):
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, gwr, layerSource.crs(), 'GWR')
             
         # Log Messages
         QgsMessageLog.logMessage(summary, "Spatial Analysis Toolbox", level=Qgis.Info)
         QgsMessageLog.logMessage('Variables: {}'.format(cols), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage(compare(estimate, started), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        results = {'OUTPUT':dest_id, 'R2':R2, 'Results': 'Check Log Message for more'}
+        if variability is not None:
+            QgsMessageLog.logMessage(variability, "Spatial Analysis Toolbox", level=Qgis.Info)
+            results['Spatial variability'] = variability
+
+        if useCache:
+            # Only the model columns (in the output order): the other attributes are not part of the key, so they are taken from the layer on a hit
+            columnsPath = tempPath('gwr_columns', '.parquet')
+            pd.DataFrame(gwr[[c for c in gwr.columns if c in allCols]]).reset_index(drop=True).to_parquet(columnsPath, index=False)
+            cacheStore(key, {'R2':R2, 'summary':summary, 'cols':cols, 'variability':variability}, {'columns': columnsPath}, cacheSize)
+            removeTemp([columnsPath])
+            results['Cache'] = 'miss'
         
-        return {'OUTPUT':dest_id, 'R2':R2, 'Results': 'Check Log Message for more'}
+        return results
+
+    def variabilityTest(self, coords, X, y, observed, bw, kernel, fixed, constant, spherical, permutations, workers, budget, cols, feedback):
+        # X and y shared read-only with the workers through memory mapped .npy files
+        XPath, yPath = tempPath('gwr_x', '.npy'), tempPath('gwr_y', '.npy')
+        np.save(XPath, X.astype(float))
+        np.save(yPath, y.astype(float))
+        cacheBytes = budget / (workers + 1) if budget is not None else 512 * 1024 * 1024
+        settings = (coords, XPath, yPath, kernel, fixed, constant, spherical, cacheBytes)
+        feedback.pushInfo('Spatial variability test: up to {} permutations, {} workers'.format(permutations, workers))
+        try:
+            if workers > 1:
+                with processPool(workers, initStationarity, settings) as pool:
+                    test = stationarityTest(observed, permutations, bw, pool, workers, feedback=feedback)
+            else:
+                initStationarity(*settings)
+                test = stationarityTest(observed, permutations, bw, feedback=feedback)
+        finally:
+            for path in (XPath, yPath):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        pValues = ', '.join('{}: {}'.format(c, round(p, 4)) for c, p in zip(cols, test['p']))
+        return 'Spatial variability p-values ({} permutations{}): {}'.format(test['permutations'], ', stopped early' if test['early'] else '', pValues)
 
     def name(self):
         return 'gwr_'
@@ -169,7 +238,14 @@ class GWR_(QgsProcessingAlgorithm):
         return 'Geographically Weighted Regression'
         
     def shortHelpString(self):
-        return ("Geographically Weighted Regression (GWR)")
+        return ("Geographically Weighted Regression (GWR). Polygon layers are handled based on their centroids. \n"
+        		"With the result cache, a run with the same variable values, geometries and parameters as a previous one "
+        		"loads the stored output layer and summary instead of fitting the model again (Cache: hit).\n"
+        		"For layers in a geographic CRS (e.g. EPSG:4326) the kernels use great circle distances, and a distance based bandwidth is in km.\n"
+        		"Before the fit, the memory and runtime are estimated from the number of features and variables; runs over the memory budget are refused.\n"
+        		"Spatial variability test (permutations > 0): Monte Carlo test of whether every coefficient varies over space. The model is refitted "
+        		"(with its own bandwidth search when the bandwidth is auto) with the locations randomly permuted, in worker processes, and the p-value of a coefficient is the share "
+        		"of permutations with a larger standard deviation of the coefficient than the fitted model. The test stops early once every p-value is clearly above or below 0.05.")
 
     def createInstance(self):
         return GWR_()
@@ -0,0 +1,106 @@
+"""
+***************************************************************************
+    GetisOrdGi.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterFeatureSink,
+                          QgsProcessingParameterEnum,
+                          Qgis,
+                          QgsProcessingUtils)
+import os
+import pandas as pd
+from .weights import METHODS, buildWeights
+from .lisa import getisOrd
+from .layerio import readLayer, outputLayer
+
+class GetisOrdGi(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    VARIABLE = 'VARIABLE'
+    METHOD = 'METHOD'
+    KNN_DIST = 'KNN_DIST'
+    STATISTIC = 'STATISTIC'
+    PERMUTATIONS = 'PERMUTATIONS'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint], defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.VARIABLE, 'Variable X', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT))
+        self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = METHODS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.KNN_DIST, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterEnum(self.STATISTIC, 'Statistic', options = ['Gi* (feature included in its neighborhood)', 'Gi'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.PERMUTATIONS, type = QgsProcessingParameterNumber.Integer,description='Permutations', defaultValue = 999, minValue = 99))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Getis-Ord Gi', createByDefault=True, supportsAppend=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        field = self.parameterAsString(parameters, self.VARIABLE, context)
+        method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
+        knn_dist = self.parameterAsDouble(parameters, self.KNN_DIST, context)
+        star = self.parameterAsInt(parameters, self.STATISTIC, context) == 0
+        permutations = self.parameterAsInt(parameters, self.PERMUTATIONS, context)
+
+        layer = layerSource
+        if layer.geometryType() == 0 and (method == 0 or method == 1):
+            return  {'Error':'This method is not available with point layers'}
+
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layer)
+
+        # Create binary spatial weights, Gi* adds the feature itself
+        w = buildWeights(data, method, knn_dist)
+        w.transform = 'B'
+
+        # Local statistics with one sparse product + permutation inference
+        GIZ, GIP, GIC = getisOrd(data[field].to_numpy(dtype=float), w.sparse, star=star, permutations=permutations)
+
+        # Join results
+        data = data.join(pd.DataFrame(GIZ, columns=['GIZ']))
+        data = data.join(pd.DataFrame(GIP, columns=['GIP']))
+        data = data.join(pd.DataFrame(GIC, columns=['GIC']))
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        self.dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, data, layer.crs(), 'Getis-Ord Gi')
+        return {self.OUTPUT: self.dest_id}
+
+    def postProcessAlgorithm(self, context, feedback):
+        currentPath = os.path.dirname(__file__)
+        processed_layer = QgsProcessingUtils.mapLayerFromString(self.dest_id, context)
+
+        if processed_layer.geometryType() == 0:
+            processed_layer.loadNamedStyle(currentPath + '/styles/GetisOrdPoints.qml')
+        elif  processed_layer.geometryType() == 2:
+            processed_layer.loadNamedStyle(currentPath + '/styles/GetisOrdPolygons.qml')
+
+        return {self.OUTPUT: self.dest_id}
+
+    def name(self):
+        return 'getisordgi'
+
+    def displayName(self):
+        return 'Getis-Ord Gi* (Hot Spot Analysis)'
+
+    def shortHelpString(self):
+        return ("Getis-Ord Gi* / Gi local statistic for hot spot analysis. \n"
+        		"The neighbors are defined with the same methods as in Local Moran's I (Queen/Rook contiguity, K Nearest Neighbors, Distance Band) using binary weights.\n"
+        		"Gi* includes each feature in its own neighborhood, Gi does not.\n"
+        		"Output fields: GIZ (z-score), GIP (pseudo p-value from conditional permutations), GIC (1 hot spot, 2 cold spot).\n"
+      			"*In KNN and Distance Band, the statistic for polygon layers is calculated based on their centroids.")
+
+    def createInstance(self):
+        return GetisOrdGi()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
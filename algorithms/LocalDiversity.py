@@ -0,0 +1,110 @@
+"""
+***************************************************************************
+    LocalDiversity.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterBoolean,
+                          QgsProcessingParameterFeatureSink,
+                          QgsProcessingParameterEnum,
+                          QgsMessageLog,
+                          Qgis)
+import pandas as pd
+from .weights import METHODS, sparseWeights, methodDescription
+from .diversity import localDiversity
+from .layerio import readLayer, outputLayer
+
+class LocalDiversity(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    FIELDS = 'FIELDS'
+    METHOD = 'METHOD'
+    KNN_DIST = 'KNN_DIST'
+    SELF = 'SELF'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint], defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.FIELDS, 'Group counts (one field per group)', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
+        self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Neighborhood', options = METHODS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.KNN_DIST, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterBoolean(self.SELF, 'Include the feature in its neighborhood', defaultValue=True))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Local Diversity', createByDefault=True, supportsAppend=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        fields = self.parameterAsFields(parameters, self.FIELDS, context)
+        method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
+        knn_dist = self.parameterAsDouble(parameters, self.KNN_DIST, context)
+        includeSelf = self.parameterAsBool(parameters, self.SELF, context)
+
+        layer = layerSource
+        if len(fields) < 2:
+            return {'Error':'At least two group fields are required'}
+        if layer.geometryType() == 0 and (method == 0 or method == 1):
+            return  {'Error':'This method is not available with point layers'}
+
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layer)
+        counts = data[fields].fillna(0).to_numpy(dtype=float)
+        if (counts < 0).any():
+            return {'Error':'Group counts cannot be negative'}
+
+        # Binary weights, the neighborhood counts are one sparse product
+        W = sparseWeights(data, method, knn_dist)
+        res = localDiversity(counts, W, includeSelf)
+
+        # Join results
+        data = data.join(pd.DataFrame({'LENT':res['entropy'], 'LSIMP':res['simpson'],
+                                       'LDISS':res['dissimilarity'], 'LISO':res['isolation']}).round(6))
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, data, layer.crs(), 'Local Diversity')
+
+        # Results
+        results = {self.OUTPUT: dest_id}
+        results['1_Groups'] = ', '.join(fields)
+        results['2_Method'] = methodDescription(method, knn_dist)
+        results['3_Dissimilarity'] = round(res['Dissimilarity'], 5)
+        results['4_Information theory H'] = round(res['Information theory H'], 5)
+        results['5_Isolation'] = ', '.join('{}: {}'.format(fld, round(v, 5)) for fld, v in zip(fields, res['Isolation']))
+
+        QgsMessageLog.logMessage('===== Local Diversity =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layer: '+str(layerSource.sourceName()), "Spatial Analysis Toolbox", level=Qgis.Info)
+        for k in ['1_Groups', '2_Method', '3_Dissimilarity', '4_Information theory H', '5_Isolation']:
+            QgsMessageLog.logMessage('{}: {}'.format(k[2:], results[k]), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return results
+
+    def name(self):
+        return 'localdiversity'
+
+    def displayName(self):
+        return 'Local Diversity and Segregation'
+
+    def shortHelpString(self):
+        return ("Local diversity and segregation measures from group counts (e.g. population per ethnic group, one field per group). \n"
+        		"The counts of every neighborhood (defined with the same methods as in Moran's I, optionally including the feature itself) "
+        		"are aggregated with the spatial weights, and the output fields are:\n"
+        		"- LENT: entropy of the neighborhood, normalized to 0 - 1.\n"
+        		"- LSIMP: Simpson diversity of the neighborhood (1 - sum of squared proportions).\n"
+        		"- LDISS: contribution of the feature to the spatial multi-group dissimilarity index.\n"
+        		"- LISO: probability that a member of the feature meets a member of the same group in the neighborhood.\n"
+        		"The spatial multi-group dissimilarity, information theory (H) and per group isolation indices of the layer are reported in the results.")
+
+    def createInstance(self):
+        return LocalDiversity()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
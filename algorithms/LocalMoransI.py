@@ -17,21 +17,40 @@ from qgis.core import    (QgsProcessing,
                           QgsFeatureSink,
                           QgsProcessingParameterFeatureSink,
                           QgsProcessingParameterEnum,
-                          QgsVectorLayer,
+                          QgsProcessingParameterFileDestination,
+                          QgsFeatureRequest,
+                          QgsFeature,
+                          QgsField,
+                          QgsFields,
+                          QgsMessageLog,
                           Qgis,
                           QgsProcessingUtils)
+from PyQt5.QtCore import QVariant
 import processing
 import os, tempfile, random, string
-import geopandas as gpd
+from concurrent.futures import as_completed
+import numpy as np
 import pandas as pd
-import libpysal
 from esda.moran import Moran_Local
+from .incremental import incrementalLocalMoran, analyticLocalMoran
+from .tiling import ID_FIELD, tileBounds, localMoranTile
+from .parallel import processPool, workerCount
+from .weights import buildWeights
+from .layerio import readLayer, outputLayer, featureChunks, removeTemp
+from .preflight import memoryBudget, extentArea, estimateLocalMoran, describe, formatBytes, start, compare
+import math
 
 class LocalMoransI(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
     VARIABLE = 'VARIABLE'
     METHOD = 'METHOD'
     KNN_DIST = 'KNN_DIST'
+    PVALUES = 'PVALUES'
+    STATE = 'STATE'
+    KEY = 'KEY'
+    TILES = 'TILES'
+    WORKERS = 'WORKERS'
+    MEMORY = 'MEMORY'
     OUTPUT = 'OUTPUT'
     
     def initAlgorithm(self, config=None):
@@ -39,6 +58,12 @@ class LocalMoransI(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterField(self.VARIABLE, 'Variable X', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT))
         self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = ['Queen contiguity', 'Rook contiguity', 'K Nearest Neighbors', 'Distance Band'], defaultValue=0))
         self.addParameter(QgsProcessingParameterNumber(self.KNN_DIST, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterEnum(self.PVALUES, 'P-values', options = ['Simulated permutations', 'Analytical (exact moments of the permutations)'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterFileDestination(self.STATE, 'Incremental state file (reused and updated between runs)', fileFilter='NumPy archive (*.npz)', optional=True, createByDefault=False))
+        self.addParameter(QgsProcessingParameterField(self.KEY, 'Feature id field (incremental mode, default: feature ids)', parentLayerParameterName=self.INPUT, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(self.TILES, type = QgsProcessingParameterNumber.Integer,description='Tiles per side for very large layers (0 = no tiling)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes for tiles (0 = all cores)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.MEMORY, type = QgsProcessingParameterNumber.Integer,description='Memory budget (MB, 0 = 80% of the available memory)', defaultValue = 0, minValue = 0))
         self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Local Morans I', createByDefault=True, supportsAppend=False, defaultValue=None))
 
 
@@ -47,77 +72,157 @@ class LocalMoransI(QgsProcessingAlgorithm):
         field = self.parameterAsString(parameters, self.VARIABLE, context)
         method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
         knn_dist = self.parameterAsDouble(parameters, self.KNN_DIST, context)
-        dest_id = None
+        analytical = self.parameterAsInt(parameters, self.PVALUES, context) == 1       # Simulated = 0, Analytical = 1
+        statePath = self.parameterAsFileOutput(parameters, self.STATE, context)
+        keyField = self.parameterAsString(parameters, self.KEY, context)
+        tiles = self.parameterAsInt(parameters, self.TILES, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        budget = memoryBudget(self.parameterAsInt(parameters, self.MEMORY, context))
+        self.dest_id = None
         #print(os.path.abspath(__file__))
         
         layer = layerSource
         if layer.geometryType() == 0 and (method == 0 or method == 1): 
             return  {'Error':'This method is not available with point layers'}
 
-        # Get temp path
-        randExt = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
-        temp = os.path.join(tempfile.gettempdir(), 'temp_{}.shp'.format(randExt))  # Path
-        
-        # Create a temp layer
-        temp = os.path.join(tempfile.gettempdir(), 'temp.shp')  # Path
+        # The incremental mode only updates analytical p-values, so its output matches a full run with them
+        if statePath and not analytical:
+            model_feedback.pushInfo('Incremental mode: analytical p-values are used')
+            analytical = True
+
+        # Pre-flight estimate. esda keeps n x permutations statistics, so a run that does not
+        # fit in the memory budget is switched to the tiled mode (sparse weights, permutations in blocks)
+        n = layer.featureCount()
+        area = extentArea(layer.extent(), layer.crs().isGeographic())
+        estimate = estimateLocalMoran(n, method, knn_dist, area, sparse=analytical)
+        if tiles == 0 and not statePath and budget is not None and estimate[0] > budget:
+            sparseEstimate = estimateLocalMoran(n, method, knn_dist, area, sparse=True)
+            tiles = max(1, math.ceil(math.sqrt(workerCount(workers) * sparseEstimate[0] / budget)))
+            model_feedback.pushInfo('Estimated memory {} exceeds the budget of {}, switching to {} x {} tiles'.format(formatBytes(estimate[0]), formatBytes(budget), tiles, tiles))
+        if tiles > 0:
+            sparseEstimate = estimateLocalMoran(n, method, knn_dist, area, sparse=True)
+            estimate = (workerCount(workers) * sparseEstimate[0] / tiles ** 2 + 32 * n, sparseEstimate[1] / min(workerCount(workers), tiles ** 2))
+        model_feedback.pushInfo('Local Morans I estimate: ' + describe(estimate))
+        started = start()
 
-        # Read shp as geodataframe
-        processing.run("sat:clonelayer", {'INPUT':layer, 'OUTPUT':temp})['OUTPUT']
-        data = gpd.read_file(temp)
+        # Tiled mode, the layer is never loaded in one GeoDataFrame
+        if tiles > 0:
+            results = self.processTiles(parameters, context, model_feedback, layer, field, method, knn_dist, tiles, workers, analytical)
+            QgsMessageLog.logMessage(compare(estimate, started), "Spatial Analysis Toolbox", level=Qgis.Info)
+            return results
+
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layer)
         
-        # If polygon & KNN or distance band then get Centroid
-        if layer.geometryType() == 2 and (method == 2 or method == 3): 
-            polygonColumn = data['geometry']
-            data['geometry'] = data.centroid
-
-        # Create spatial weights
-        if method == 0:
-            w = libpysal.weights.contiguity.Queen.from_shapefile(temp)
-        elif method == 1:
-            w = libpysal.weights.contiguity.Rook.from_shapefile(temp)
-        elif method == 2:
-            w = libpysal.weights.distance.KNN.from_shapefile(temp, k=knn_dist)
-        elif method ==3:
-            w = libpysal.weights.distance.DistanceBand.from_shapefile(temp, threshold=knn_dist)
+        # Incremental mode: reuse the weights and lags of the previous run, matching features on their ids
+        if statePath:
+            if keyField:
+                keys = data[keyField]
+            else:
+                keys = [ftr.id() for ftr in layer.getFeatures(QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes())]
+            if len(set(keys)) != len(keys):
+                return {'Error':'Feature id field has duplicate values'}
+            LMI, LMP, LMQ, summary = incrementalLocalMoran(data, field, keys, method, knn_dist, statePath)
+            model_feedback.pushInfo('Local Morans I update: ' + ', '.join('{}: {}'.format(k, v) for k, v in summary.items()))
+        elif analytical:
+            # Sparse weights and the same statistics as the incremental mode
+            LMI, LMP, LMQ = analyticLocalMoran(data, field, method, knn_dist)
+        else:
+            # Create spatial weights (centroids for polygons with KNN or distance band)
+            w = buildWeights(data, method, knn_dist)
             
-        # y variable
-        y = data[field]
-
-        # Initialize Local Moran's I
-        localMoran = Moran_Local(y, w)
+            # y variable
+            y = data[field]
 
-        # Local Morans results
-        LMI = localMoran.Is              # Index
-        LMQ = localMoran.q              # Category 1 HH, 2 LH, 3 LL, 4 HL
-        LMP = localMoran.p_z_sim    # P value
+            # Initialize Local Moran's I
+            localMoran = Moran_Local(y, w)
 
-        # If Local morans was calculated with centroids, change dataframe back to polygons
-        if layer.geometryType() == 2 and (method == 2 or method == 3): 
-            data['geometry'] = polygonColumn
+            # Local Morans results
+            LMI = localMoran.Is              # Index
+            LMQ = localMoran.q              # Category 1 HH, 2 LH, 3 LL, 4 HL
+            LMP = localMoran.p_z_sim    # P value
 
         # Join results
         data = data.join(pd.DataFrame(LMI, columns=['LMI']))
         data = data.join(pd.DataFrame(LMP, columns=['LMP']))
         data = data.join(pd.DataFrame(LMQ, columns=['LMQ']))
+        data['LMP_TYPE'] = 'analytical' if analytical else 'permutations'
 
-        # Output
-        outPath = os.path.join(tempfile.gettempdir(), 'temp_lmi_{}.shp'.format(randExt))
-        data.to_file(outPath)
-        vectorLayer = QgsVectorLayer(outPath,"Local Morans I","ogr")
-        vectorLayer.setCrs(layer.crs())
-
-        # Output & Load to QGIS
-        source = vectorLayer
-        (sink, self.dest_id) = self.parameterAsSink(parameters, self.OUTPUT , context , source.fields() , source.wkbType() ,source.sourceCrs())
-        features = source.getFeatures()
-        for current, feature in enumerate(features):
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        self.dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, data, layer.crs(), 'Local Morans I')
+        QgsMessageLog.logMessage(compare(estimate, started), "Spatial Analysis Toolbox", level=Qgis.Info)
+        if statePath:
+            return {self.OUTPUT: self.dest_id, self.STATE: statePath}
         return {self.OUTPUT: self.dest_id}
 
+    def processTiles(self, parameters, context, feedback, layer, field, method, knn_dist, tiles, workers, analytical):
+        randExt = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
+        tempDir = tempfile.gettempdir()
+
+        # Copy with a global id per feature (in the order of the layer), read by the workers tile by tile
+        temp = os.path.join(tempDir, 'temp_tiles_{}.gpkg'.format(randExt))
+        zPath = os.path.join(tempDir, 'temp_tiles_{}_z.npy'.format(randExt))
+        resultsPath = os.path.join(tempDir, 'temp_tiles_{}_lmi.npy'.format(randExt))
+        results = None
+        try:
+            processing.run("native:addautoincrementalfield", {'INPUT':layer, 'FIELD_NAME':ID_FIELD, 'START':0, 'OUTPUT':temp})
+
+            # Global mean / sum of squares up front, so every tile is standardized as the whole layer (NULL to NaN)
+            y = np.concatenate([chunk[:, 0] for chunk in featureChunks(layer, [field], 65536)] or [np.empty(0)])
+            n = y.shape[0]
+            z = y - y.mean()
+            ss = float((z * z).sum())
+            np.save(zPath, z)
+            del y, z
+            np.lib.format.open_memmap(resultsPath, mode='w+', dtype=float, shape=(n, 3)).flush()
+
+            # Tiles in a process pool, every worker writes its rows of the results
+            ext = layer.extent()
+            extent = (ext.xMinimum(), ext.yMinimum(), ext.xMaximum(), ext.yMaximum())
+            done = 0
+            with processPool(workers) as pool:
+                futures = [pool.submit(localMoranTile, temp, field, bounds, lastX, lastY, extent, method, knn_dist, zPath, ss, resultsPath, 0 if analytical else 999, None)
+                           for bounds, lastX, lastY in tileBounds(extent, tiles)]
+                for future in as_completed(futures):
+                    done += future.result()
+                    feedback.setProgress(50 * done / max(n, 1))
+                    if feedback.isCanceled():
+                        for f in futures:
+                            f.cancel()
+                        return {}
+            feedback.pushInfo('Local Morans I calculated for {} features in {} tiles'.format(done, tiles * tiles))
+
+            # Stitch: stream the features of the layer with their results
+            results = np.load(resultsPath, mmap_mode='r')
+            fields = QgsFields(layer.fields())
+            fields.append(QgsField('LMI', QVariant.Double))
+            fields.append(QgsField('LMP', QVariant.Double))
+            fields.append(QgsField('LMQ', QVariant.Int))
+            fields.append(QgsField('LMP_TYPE', QVariant.String))
+            pType = 'analytical' if analytical else 'permutations'
+            (sink, self.dest_id) = self.parameterAsSink(parameters, self.OUTPUT , context , fields , layer.wkbType() ,layer.sourceCrs())
+            for i, ftr in enumerate(layer.getFeatures()):
+                feature = QgsFeature(fields)
+                feature.setGeometry(ftr.geometry())
+                feature.setAttributes(ftr.attributes() + [float(results[i, 0]), float(results[i, 1]), int(results[i, 2]), pType])
+                sink.addFeature(feature, QgsFeatureSink.FastInsert)
+                if i % 10000 == 0:
+                    feedback.setProgress(50 + 50 * i / max(n, 1))
+            return {self.OUTPUT: self.dest_id}
+        finally:
+            # The memory map is closed before its file is removed
+            del results
+            removeTemp([temp, zPath, resultsPath])
+
     def postProcessAlgorithm(self, context, feedback):
+        # Nothing to style when the run was canceled or failed before the output
+        if getattr(self, 'dest_id', None) is None:
+            return {}
         os.chdir(os.path.dirname(__file__))
         currentPath = os.getcwd()       
         processed_layer = QgsProcessingUtils.mapLayerFromString(self.dest_id, context)
+        if processed_layer is None:
+            return {self.OUTPUT: self.dest_id}
 
         if processed_layer.geometryType() == 0:
             processed_layer.loadNamedStyle(currentPath + '/styles/LocalMoransPoints.qml')
@@ -138,7 +243,16 @@ class LocalMoransI(QgsProcessingAlgorithm):
         		"- Queen contiguity in which areas with common edges or corners are considered neighbors (works only for polygon layers).\n"
         		"- K Nearest Neighbors (works with point/polygon* layers).\n"
        			"- Distance Band, in which areas or points within a fixed distance are considered neighbors (works with point/polygon* layers).\n"
-      			"*In KNN and Distance Band, Morans I for polygon layers is calculated based on their centroids.")
+      			"*In KNN and Distance Band, Morans I for polygon layers is calculated based on their centroids.\n"
+      			"For layers in a geographic CRS (e.g. EPSG:4326), KNN and Distance Band use great circle distances, with the distance threshold in km.\n"
+      			"Incremental mode: when a state file is given, the weights, lags and results of the run are stored in it, keyed by feature id. "
+      			"The next run with the same file only recomputes the neighborhoods of edited, added and removed features and gives the same output as a full run. "
+      			"P-values: simulated (999 conditional permutations, as esda) or analytical, from the exact mean and variance of the same permutations (normal approximation). "
+      			"The incremental mode always uses analytical p-values, so its output is the same as a full run with analytical p-values. "
+      			"The LMP_TYPE field of the output states which ones were used ('analytical' or 'permutations'): only p-values of the same type are comparable between runs.\n"
+      			"Tiled mode (tiles > 0): for layers too large for one process, the layer is split in a grid of tiles, each tile is read with a halo of its possible neighbors "
+      			"and processed in a pool of worker processes, using the mean and variance of the whole layer, and the results are stitched to the output features.\n"
+      			"Before the run, the memory and runtime are estimated from the number of features and the method. If the memory budget would be exceeded, the tiled mode is used.")
 
     def createInstance(self):
         return LocalMoransI()
@@ -21,9 +21,12 @@ from qgis.core import (QgsProcessing,
                                 Qgis,
                                 QgsSymbol,
                                 QgsStyle,
-                                QgsGraduatedSymbolRenderer)
+                                QgsGraduatedSymbolRenderer,
+                                NULL)
 from PyQt5.QtCore import QVariant
 import os
+import numpy as np
+import pandas as pd
 
 class LocationQuotient(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
@@ -31,12 +34,14 @@ class LocationQuotient(QgsProcessingAlgorithm):
     VARIABLEX = 'VARIABLEX'
     VARIABLEY = 'VARIABLEY'
     LQFIELD = 'LQFIELD'
+    GROUPS = 'GROUPS'
 
     def initAlgorithm(self, config=None):
         self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Layer', types=[QgsProcessing.TypeVectorAnyGeometry], defaultValue=None))
         self.addParameter(QgsProcessingParameterField(self.VARIABLEX, 'Variable X', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT))
         self.addParameter(QgsProcessingParameterField(self.VARIABLEY, 'Variable Y', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT))
         self.addParameter(QgsProcessingParameterString(self.LQFIELD, 'Name for LQ Field ', defaultValue = 'LQ'))
+        self.addParameter(QgsProcessingParameterField(self.GROUPS, 'Reference region fields (from the largest to the smallest level)', parentLayerParameterName=self.INPUT, allowMultiple=True, optional=True))
         self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Location Quotient', createByDefault=True, defaultValue=None))
 
     def processAlgorithm(self, parameters, context, model_feedback):
@@ -45,41 +50,57 @@ class LocationQuotient(QgsProcessingAlgorithm):
         variableX = self.parameterAsString(parameters, self.VARIABLEX, context)
         variableY = self.parameterAsString(parameters, self.VARIABLEY, context)
         lqField = self.parameterAsString(parameters, self.LQFIELD, context)
+        groups = self.parameterAsFields(parameters, self.GROUPS, context)
         self.field = lqField
         dest_id = None
         
         # Clone layer
         layer = processing.run("sat:clonelayer", {'INPUT':layer, 'OUTPUT':'TEMPORARY_OUTPUT'})['OUTPUT']
-        # Creating new field for LQ
+        # Creating new fields for LQ, one against the whole layer and one per reference region level
         flds = layer.fields()
         pr = layer.dataProvider()
+        lqFields = [lqField] + ['{}_{}'.format(lqField, grp) for grp in groups]
         
-        # Checking if LQField exists
-        if lqField not in flds.names():
-            pr.addAttributes([QgsField(lqField, QVariant.Double, len=10, prec=5)])
-            layer.updateFields()
-            flds = layer.fields()
-        else:
-            return{'Error:':'LQ Field name already exists'}
+        # Checking if LQ fields exist
+        for fld in lqFields:
+            if fld in flds.names():
+                return{'Error:':'LQ Field name already exists: ' + fld}
+        pr.addAttributes([QgsField(fld, QVariant.Double, len=10, prec=5) for fld in lqFields])
+        layer.updateFields()
+        flds = layer.fields()
 
-        # Getting field index from name
-        idx1 = flds.indexOf(variableX)
-        idx2 = flds.indexOf(variableY)
-        LQFieldIdx = flds.indexOf(lqField)
-        # Calculating bottom part of fraction (Xi/Yi)
-        X = 0   #Sum of xi
-        Y = 0   #Sum of yi
-        for ftr in layer.getFeatures():
-            X += ftr[idx1]
-            Y += ftr[idx2]
-        XoverY = X/Y
-        
-        # Calculating LQ
+        # Variables and reference regions to a table, in one pass over the features
+        names = [variableX, variableY] + groups
+        ids = []
+        rows = []
         for ftr in layer.getFeatures():
-            xovery = ftr[idx1] / ftr[idx2]
-            LQ = xovery / XoverY
-            toAdd = {LQFieldIdx:LQ}
-            pr.changeAttributeValues({ftr.id():toAdd})
+            ids.append(ftr.id())
+            rows.append([None if ftr[fld] == NULL else ftr[fld] for fld in names])
+        table = pd.DataFrame(rows, columns=['x', 'y'] + groups)
+        x = pd.to_numeric(table['x'], errors='coerce')
+        y = pd.to_numeric(table['y'], errors='coerce')
+
+        # xi/yi of every feature
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xovery = x / y
+
+        # Bottom part of fraction (X/Y), for the whole layer and for the parent region of every feature at each level.
+        # Levels are nested, so a region is identified by its value and the values of all the larger levels.
+        LQs = [xovery / (x.sum() / y.sum())]
+        for level in range(len(groups)):
+            keys = [table[grp] for grp in groups[:level+1]]
+            X = x.groupby(keys, dropna=False).transform('sum')
+            Y = y.groupby(keys, dropna=False).transform('sum')
+            LQs.append(xovery / (X / Y))
+        LQs = np.column_stack(LQs)
+        LQs[~np.isfinite(LQs)] = np.nan
+
+        # Writing all the values with one call
+        indices = [flds.indexOf(fld) for fld in lqFields]
+        changes = {}
+        for fid, row in zip(ids, LQs):
+            changes[fid] = {idx: (None if np.isnan(v) else float(v)) for idx, v in zip(indices, row)}
+        pr.changeAttributeValues(changes)
         layer.updateFields()
 
         source = layer
@@ -124,7 +145,9 @@ class LocationQuotient(QgsProcessingAlgorithm):
         return (
 "LQ compares the percentage of two variables in a region with the percentage of the same variables in a larger geographic unit (e.g. the whole country). \n"
 "Location Quoetient formula: LQ = (xi/yi) / (Xi/Yi) where xi, yi are the variables and Xi, Yi is the summary of xi,yi in the wider area. \n"
-"LQ Algorithm requires a vector layer (any geometry) and two fields as x, y variables. It calculates the LQ  and the value in the attribute table for each feature.")
+"LQ Algorithm requires a vector layer (any geometry) and two fields as x, y variables. It calculates the LQ  and the value in the attribute table for each feature. \n"
+"Optionally, one or more reference region fields (e.g. state, then county) can be given, from the largest to the smallest level. "
+"For every level an extra field <LQ Field>_<region field> is added, with the LQ against the totals of the parent region of the feature at that level.")
     def createInstance(self):
         return LocationQuotient()
 
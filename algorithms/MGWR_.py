@@ -0,0 +1,164 @@
+"""
+***************************************************************************
+    MGWR_.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterBoolean,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterEnum,
+                          QgsProcessingParameterFeatureSink,
+                          QgsMessageLog,
+                          Qgis)
+import pandas as pd
+import contextlib, io
+from .layerio import readLayer, outputLayer
+from .weights import pointCoordinates
+from .parallel import processPool, workerCount
+from .multiscale import initKernels, KernelProducts, PooledSel_BW, PooledMGWR
+
+class MGWR_(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    DEP = 'DEP'
+    INDEP = 'INDEP'
+    KERNEL = 'KERNEL'
+    FIXED = 'FIXED'
+    CONSTANT = 'CONSTANT'
+    STANDARDIZE = 'STANDARDIZE'
+    WORKERS = 'WORKERS'
+    KERNEL_CACHE = 'KERNEL_CACHE'
+    CHUNKS = 'CHUNKS'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint],  defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.INDEP, 'Independent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
+        self.addParameter(QgsProcessingParameterField(self.DEP, 'Dependent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=False, defaultValue=''))
+        self.addParameter(QgsProcessingParameterEnum(self.KERNEL, 'Kernel Method', options = ['Gaussian', 'Bisquare', 'Exponential'], defaultValue=1))
+        self.addParameter(QgsProcessingParameterEnum(self.FIXED, 'Kernel Type', options = ['Adaptive - NN', 'Distance based'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(self.CONSTANT, 'Calculate constant', options = ['True', 'False'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(self.STANDARDIZE, 'Standardize the variables (comparable bandwidths)', defaultValue=True))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes (0 = all cores)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.KERNEL_CACHE, type = QgsProcessingParameterNumber.Integer,description='Kernel cache per process (MB)', defaultValue = 1024, minValue = 0))
+        self.addParameter(QgsProcessingParameterNumber(self.CHUNKS, type = QgsProcessingParameterNumber.Integer,description='Inference chunks per worker (more chunks = less memory)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'MGWR', createByDefault=True, supportsAppend=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        yField = self.parameterAsFields(parameters, self.DEP, context)[0]
+        xFields = self.parameterAsFields(parameters, self.INDEP, context)
+        kernel = self.parameterAsInt(parameters, self.KERNEL, context)
+        fixed = self.parameterAsInt(parameters, self.FIXED, context)
+        constant = self.parameterAsInt(parameters, self.CONSTANT, context)
+        standardize = self.parameterAsBool(parameters, self.STANDARDIZE, context)
+        workers = workerCount(self.parameterAsInt(parameters, self.WORKERS, context))
+        cacheSize = self.parameterAsInt(parameters, self.KERNEL_CACHE, context)
+        chunks = self.parameterAsInt(parameters, self.CHUNKS, context)
+
+        if yField in xFields:
+            return {'Error':'A variable cannot be both Dependent and Independent'}
+
+        data = readLayer(layerSource)
+
+        # Array with coords (centroids for polygons)
+        coords = pointCoordinates(data)
+
+        # Arrays with x and y variables
+        X = data[xFields].to_numpy(dtype=float)
+        y = data[yField].to_numpy(dtype=float).reshape((-1,1))
+        if standardize:
+            # A constant variable cannot be standardized (zero standard deviation)
+            constantFields = [fld for fld, sd in zip([yField] + xFields, [y.std()] + list(X.std(axis=0))) if not sd > 0]
+            if constantFields:
+                return {'Error':'Cannot standardize variables with constant values: {}'.format(', '.join(constantFields))}
+            X = (X - X.mean(axis=0)) / X.std(axis=0)
+            y = (y - y.mean()) / y.std()
+        cols = ['X{}_{}'.format(str(i+1),str(fld)) for i, fld in enumerate(xFields)]
+        t_stats = ['X{}_t-test'.format(str(i+1)) for i in range(len(xFields))]
+
+        # Parameters
+        kernel = ['gaussian', 'bisquare', 'exponential'][kernel]
+        fixed = fixed == 1
+        constant = constant == 0
+        if constant:
+            cols.insert(0, 'X0_Const')
+            t_stats.insert(0,'X0_t-test')
+        # Great circle distances (km) for geographic CRSs, coords are lon / lat
+        spherical = layerSource.crs().isGeographic()
+
+        # Bandwidth searches (backfitting) and chunked inference, in the process pool when there is more than one worker
+        settings = (coords, kernel, fixed, spherical, cacheSize * 1024 * 1024)
+        initKernels(*settings)
+        with contextlib.ExitStack() as stack:
+            pool = stack.enter_context(processPool(workers, initKernels, settings)) if workers > 1 else None
+            products = KernelProducts(coords.shape[0], pool, workers)
+            model_feedback.pushInfo('Bandwidth search ({} workers)'.format(workers))
+            selector = PooledSel_BW(coords, y, X, products, feedback=model_feedback, multi=True, kernel=kernel, fixed=fixed, constant=constant, spherical=spherical)
+            bws = selector.search(multi_bw_min=[None] if fixed else [2])
+            model_feedback.setProgress(50)
+            if model_feedback.isCanceled():
+                return {}
+            model_feedback.pushInfo('Inference ({} chunks)'.format(workers * chunks))
+            model = PooledMGWR(coords, y, X, selector, kernel=kernel, fixed=fixed, constant=constant, spherical=spherical, name_x=cols)
+            res = model.fit(n_chunks=chunks, pool=pool, workers=workers, feedback=model_feedback)
+
+        R2 = round(res.R2,3)
+
+        # res.summary prints the summary, captured for the Log Messages
+        summary = io.StringIO()
+        with contextlib.redirect_stdout(summary):
+            res.summary()
+        summary = summary.getvalue()
+
+        # Join to gdf
+        mgwr = data.join(pd.DataFrame(res.params, columns = cols))
+        mgwr = mgwr.join(pd.DataFrame(res.predy, columns = ['predY']))
+        mgwr = mgwr.join(pd.DataFrame(res.resid_response, columns = ['residuals']))
+        mgwr = mgwr.join(pd.DataFrame(res.tvalues, columns = t_stats))
+
+        # Round values
+        allCols = cols + t_stats + ['predY', 'residuals']
+        mgwr.loc[:, allCols] = mgwr[allCols].round(4)
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, mgwr, layerSource.crs(), 'MGWR')
+
+        # Log Messages
+        bandwidths = ', '.join('{}: {}'.format(c, b) for c, b in zip(cols, bws))
+        QgsMessageLog.logMessage(summary, "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Bandwidths: {}'.format(bandwidths), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Kernel fits: {}, workers: {}, inference chunks: {}'.format(products.evaluations, workers, workers * chunks), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return {'OUTPUT':dest_id, 'R2':R2, 'Bandwidths':bandwidths, 'Results': 'Check Log Message for more'}
+
+    def name(self):
+        return 'mgwr_'
+
+    def displayName(self):
+        return 'Multiscale Geographically Weighted Regression'
+
+    def shortHelpString(self):
+        return ("Multiscale Geographically Weighted Regression (MGWR), with one bandwidth per covariate selected by backfitting (AICc, golden section). "
+        		"Polygon layers are handled based on their centroids. \n"
+        		"Standardizing the variables is recommended, so that the bandwidths of the covariates are comparable.\n"
+        		"The kernel of every bandwidth is kept in a cache (per process, up to the given size), so the bandwidths visited again "
+        		"in later backfitting iterations and in the inference are not recomputed. Kernels larger than the cache are computed by blocks of rows in the worker processes.\n"
+        		"The inference is split in chunks (workers x chunks per worker) computed in the worker processes; more chunks need less memory.\n"
+        		"For layers in a geographic CRS (e.g. EPSG:4326) the kernels use great circle distances, and a distance based bandwidth is in km.")
+
+    def createInstance(self):
+        return MGWR_()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
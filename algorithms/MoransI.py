@@ -14,67 +14,184 @@ from qgis.core import (QgsProcessing,
                        QgsProcessingParameterField,
                        QgsProcessingParameterNumber,
                        QgsProcessingParameterEnum,
+                       QgsProcessingParameterBoolean,
+                       QgsProcessingParameterMultipleLayers,
+                       QgsProcessingParameterFeatureSink,
                        QgsMessageLog,
                        Qgis)
-import libpysal
 from esda.moran import Moran
-import os, tempfile
-import processing
+import time
+import pandas as pd
+from .autocorrelation import globalAutocorrelation
+from .cache import cacheKey, cacheLookup, cacheStore
+from .weights import buildWeights, sparseWeights, methodDescription, METHODS
+from .layerio import readLayer, featureCentroids, layerFile, removeTemp, outputTable
+from .batch import moranRow, moranRows, runBatch, resultsTable, MORAN_COLUMNS
+from .parallel import workerCount
+from .sampling import sampledMoran
+from .preflight import memoryBudget, extentArea, estimateMoran, describe, formatBytes, start, compare
 
 class MoransI(QgsProcessingAlgorithm):
     LAYER = 'LAYER'
     VARIABLE = 'VARIABLE'
     METHOD = 'METHOD'
     PARAM = 'PARAM'
+    SUITE = 'SUITE'
+    PERMUTATIONS = 'PERMUTATIONS'
+    CACHE = 'CACHE'
+    CACHE_SIZE = 'CACHE_SIZE'
+    MEMORY = 'MEMORY'
+    MODE = 'MODE'
+    SAMPLE = 'SAMPLE'
+    DRAWS = 'DRAWS'
+    TIME_BUDGET = 'TIME_BUDGET'
+    LAYERS = 'LAYERS'
+    VARIABLES = 'VARIABLES'
+    METHODS = 'METHODS'
+    WORKERS = 'WORKERS'
+    TABLE = 'TABLE'
     
     def initAlgorithm(self, config=None):
         self.addParameter(QgsProcessingParameterVectorLayer(self.LAYER, 'Layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint], defaultValue=None))
         self.addParameter(QgsProcessingParameterField(self.VARIABLE, 'Variable X', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.LAYER))
         self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = ['Queen contiguity', 'Rook contiguity', 'K Nearest Neighbors', 'Distance Band'], defaultValue=0))
         self.addParameter(QgsProcessingParameterNumber(self.PARAM, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterBoolean(self.SUITE, 'Also calculate Geary\'s C and Getis-Ord General G', defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.PERMUTATIONS, type = QgsProcessingParameterNumber.Integer,description='Permutations (only with Geary\'s C / General G)', defaultValue = 999, minValue = 99))
+        self.addParameter(QgsProcessingParameterBoolean(self.CACHE, 'Reuse cached results of identical runs', defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.CACHE_SIZE, type = QgsProcessingParameterNumber.Integer,description='Cache size limit (MB)', defaultValue = 1024, minValue = 1))
+        self.addParameter(QgsProcessingParameterNumber(self.MEMORY, type = QgsProcessingParameterNumber.Integer,description='Memory budget (MB, 0 = 80% of the available memory)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterEnum(self.MODE, 'Mode', options = ['Exact', 'Approximate (random samples)', 'Approximate (spatially stratified samples)'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.SAMPLE, type = QgsProcessingParameterNumber.Integer,description='Sample size (approximate mode)', defaultValue = 10000, minValue = 10))
+        self.addParameter(QgsProcessingParameterNumber(self.DRAWS, type = QgsProcessingParameterNumber.Integer,description='Max number of samples (approximate mode)', defaultValue = 30, minValue = 2))
+        self.addParameter(QgsProcessingParameterNumber(self.TIME_BUDGET, type = QgsProcessingParameterNumber.Double,description='Time budget in seconds (approximate mode, 0 = no limit)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterMultipleLayers(self.LAYERS, 'Additional layers (batch)', layerType=QgsProcessing.TypeVectorAnyGeometry, optional=True))
+        self.addParameter(QgsProcessingParameterField(self.VARIABLES, 'Additional variables (batch)', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.LAYER, allowMultiple=True, optional=True))
+        self.addParameter(QgsProcessingParameterEnum(self.METHODS, 'Additional methods (batch)', options = METHODS, allowMultiple=True, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, type = QgsProcessingParameterNumber.Integer,description='Worker processes (batch, 0 = all cores)', defaultValue = 0, minValue = 0))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.TABLE, 'Results table', type=QgsProcessing.TypeVector, createByDefault=False, optional=True, defaultValue=None))
 
     def processAlgorithm(self, parameters, context, model_feedback):
+        # The time budget of the approximate mode counts from here (reading the layer included)
+        runStarted = time.perf_counter()
+
         # Parameters to layers/numbers
         layerSource = self.parameterAsVectorLayer(parameters, self.LAYER, context)
         variable = self.parameterAsString(parameters, self.VARIABLE, context)
         method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
         knn_dist = self.parameterAsDouble(parameters, self.PARAM, context)
+        suite = self.parameterAsBool(parameters, self.SUITE, context)
+        permutations = self.parameterAsInt(parameters, self.PERMUTATIONS, context)
+        useCache = self.parameterAsBool(parameters, self.CACHE, context)
+        cacheSize = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        budget = memoryBudget(self.parameterAsInt(parameters, self.MEMORY, context))
+        mode = self.parameterAsInt(parameters, self.MODE, context)       # Exact = 0, Random samples = 1, Stratified samples = 2
+        sampleSize = self.parameterAsInt(parameters, self.SAMPLE, context)
+        draws = self.parameterAsInt(parameters, self.DRAWS, context)
+        timeBudget = self.parameterAsDouble(parameters, self.TIME_BUDGET, context)
+        extraLayers = self.parameterAsLayerList(parameters, self.LAYERS, context)
+        extraVariables = self.parameterAsFields(parameters, self.VARIABLES, context)
+        extraMethods = self.parameterAsEnums(parameters, self.METHODS, context)
+        workers = workerCount(self.parameterAsInt(parameters, self.WORKERS, context))
         
         layer = layerSource
-        
-        # List with variables
-        y = []
-        for ftr in layer.getFeatures():
-            y.append(ftr[variable])
 
-        # Create a temp layer
-        temp = os.path.join(tempfile.gettempdir(), 'temp.shp')  # Path
+        # More than one layer, variable or method -> batch run, one row per layer x variable x method
+        layers = [layer] + [l for l in extraLayers if l.id() != layer.id()]
+        variables = [variable] + [v for v in extraVariables if v != variable]
+        methods = [method] + [m for m in extraMethods if m != method]
+        if len(layers) * len(variables) * len(methods) > 1:
+            # Exact, uncached and always with sparse weights: the options of single runs are not used
+            if mode > 0:
+                model_feedback.reportError('Batch: the approximate mode is not available, the exact Moran\'s I is calculated')
+            if useCache:
+                model_feedback.reportError('Batch: the result cache (and its size limit) is not used')
+            if self.parameterAsInt(parameters, self.MEMORY, context) > 0:
+                model_feedback.reportError('Batch: the memory budget is not used, the weights are always sparse')
+            return self.batch(parameters, context, model_feedback, layers, variables, methods, knn_dist, suite, permutations, workers)
+
+        # Same data and parameters as a previous run -> stored results (not with a results table to write)
+        if useCache and mode == 0:
+            key = cacheKey(self.name(), {'method':method, 'knn_dist':knn_dist, 'suite':suite, 'permutations':permutations}, layer, [variable])
+            cached = cacheLookup(key) if parameters.get(self.TABLE) is None else None
+            if cached is not None:
+                results = dict(cached[0], Cache='hit')
+                QgsMessageLog.logMessage('===== Morans I (cached results) =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+                for k, v in results.items():
+                    QgsMessageLog.logMessage('{} {}'.format(k, v), "Spatial Analysis Toolbox", level=Qgis.Info)
+                return results
+        
         if layer.geometryType() == 0 and (method == 0 or method == 1):
             return {'Error':'This method is not available with point layers'}
-        elif layer.geometryType() == 2 and (method == 2 or method == 3):
-            processing.run("native:centroids", {'INPUT':layer,
-                                                'ALL_PARTS':False,
-                                                'OUTPUT':temp})['OUTPUT']
+
+        # Approximate mode: Moran's I from samples of features, neighbors from the whole layer
+        # (KNN / Distance Band only need the variable and the centroids, contiguity the geometries)
+        if mode > 0:
+            data = readLayer(layer, [variable]) if method in (0, 1) else featureCentroids(layer, [variable])
+            try:
+                res = sampledMoran(data, data[variable].to_numpy(dtype=float), method, knn_dist, sampleSize, draws, mode == 2, timeBudget, started=runStarted)
+            except ValueError as e:
+                return {'Error': str(e)}
+            results = {}
+            results['1_Layer: '] = 'Layer: '+str(layerSource.sourceName())
+            results['2_Variable: '] = str(variable)
+            results['3_Method'] = methodDescription(method, knn_dist)
+            results['4_Morans-I (approximate)'] = round(res['estimate'],5)
+            results['5_Expected Value'] = round(res['expected'],5)
+            results['6_95% Confidence interval'] = '{} - {}'.format(round(res['low'],5), round(res['high'],5))
+            results['7_Samples'] = '{} samples of {} features ({})'.format(res['draws'], res['sampleSize'], 'spatially stratified' if mode == 2 else 'random')
+            results['8_Elapsed time (s)'] = round(res['elapsed'],2)
+            row = moranRow(layerSource.sourceName(), variable, results['3_Method'], data.shape[0], (res['estimate'], res['expected'], None, None, None))
+            tableId = outputTable(self, parameters, self.TABLE, context, resultsTable([row], MORAN_COLUMNS))
+            if tableId is not None:
+                results[self.TABLE] = tableId
+            QgsMessageLog.logMessage('===== Morans I (approximate) =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+            for k, v in results.items():
+                QgsMessageLog.logMessage('{} {}'.format(k[2:], v), "Spatial Analysis Toolbox", level=Qgis.Info)
+            return results
+
+        # Pre-flight estimate, sparse weights (and permutations in blocks) if libpysal weights do not fit in the memory budget
+        n = layer.featureCount()
+        area = extentArea(layer.extent(), layer.crs().isGeographic())
+        estimate = estimateMoran(n, method, knn_dist, area, permutations)
+        sparse = budget is not None and estimate[0] > budget
+        if sparse:
+            estimate = estimateMoran(n, method, knn_dist, area, permutations, sparse=True)
+            if estimate[0] > budget:
+                return {'Error':'Morans I needs about {} of memory, more than the budget of {}'.format(formatBytes(estimate[0]), formatBytes(budget))}
+            model_feedback.pushInfo('Memory budget of {} exceeded by libpysal weights, using sparse weights'.format(formatBytes(budget)))
+        model_feedback.pushInfo('Morans I estimate: ' + describe(estimate))
+        started = start()
+
+        # Variable and geometries (GeoParquet / Feather read directly)
+        data = readLayer(layer, [variable])
+        y = data[variable].to_numpy(dtype=float)
+
+        # Create spatial weights (centroids for polygons with KNN or distance band)
+        if sparse:
+            W = sparseWeights(data, method, knn_dist)
         else:
-            processing.run("sat:clonelayer", {'INPUT':layer,
-                                                 'OUTPUT':temp})['OUTPUT']
-
-        # Create spatial weights
-        if method == 0:
-            w = libpysal.weights.contiguity.Queen.from_shapefile(temp)
-        elif method == 1:
-            w = libpysal.weights.contiguity.Rook.from_shapefile(temp)
-        elif method == 2:
-            w = libpysal.weights.distance.KNN.from_shapefile(temp, k=knn_dist)
-        elif method ==3:
-            w = libpysal.weights.distance.DistanceBand.from_shapefile(temp, threshold=knn_dist)
+            w = buildWeights(data, method, knn_dist)
         
         # Calculate Moran's I
-        MoransI = Moran(y, w)
-        MI = MoransI.I
-        EI = MoransI.EI
-        Zscore = MoransI.z_norm
-        Pvalue = MoransI.p_norm
+        if sparse and not suite:
+            MI, EI, Zscore, Pvalue, PseudoP = globalAutocorrelation(y, W, permutations, statistics=("Moran's I",))["Moran's I"]
+        elif not suite:
+            MoransI = Moran(y, w)
+            MI = MoransI.I
+            EI = MoransI.EI
+            Zscore = MoransI.z_norm
+            Pvalue = MoransI.p_norm
+            PseudoP = MoransI.p_sim
+        # Moran's I, Geary's C and General G sharing the weights, the sparse products and the permutations
+        else:
+            if not sparse:
+                w.transform = 'B'
+                W = w.sparse
+            suiteResults = globalAutocorrelation(y, W, permutations)
+            MI, EI, Zscore, Pvalue, PseudoP = suiteResults["Moran's I"]
+            table = pd.DataFrame([[name] + [round(v,5) for v in values[:3]] + list(values[3:]) for name, values in suiteResults.items()],
+                                 columns = ['Statistic', 'Value', 'Expected Value', 'Z-score', 'P-value', 'Pseudo P-value']).set_index('Statistic')
 
         # Results
         results = {}
@@ -89,6 +206,18 @@ class MoransI(QgsProcessingAlgorithm):
         results['6_Z-score'] = round(Zscore,5)
         results['7_P-value'] = Pvalue
         results['8_Details: '] = 'Check message log for more info'
+        if suite:
+            CI, EC, ZC, PC, PseudoPC = suiteResults["Geary's C"]
+            GG, EG, ZG, PG, PseudoPG = suiteResults['General G']
+            results['9_Morans-I Pseudo P-value'] = PseudoP
+            results['9_Gearys-C'] = round(CI,5)
+            results['9_Gearys-C Z-score'] = round(ZC,5)
+            results['9_Gearys-C P-value'] = PC
+            results['9_General-G'] = round(GG,5)
+            results['9_General-G Z-score'] = round(ZG,5)
+            results['9_General-G P-value'] = PG
+            results['9_Pseudo P-values'] = 'Gearys-C: {}, General-G: {}'.format(PseudoPC, PseudoPG)
+            results['9_Results table'] = table.to_string()
     
         # Report in Log Messages
         QgsMessageLog.logMessage('===== Morans I =====', "Spatial Analysis Toolbox", level=Qgis.Info)
@@ -100,9 +229,61 @@ class MoransI(QgsProcessingAlgorithm):
         elif method == 3: QgsMessageLog.logMessage('Distance Band, Fixed Distance = '+str(knn_dist), "Spatial Analysis Toolbox", level=Qgis.Info)
         QgsMessageLog.logMessage('Morans I = '+str(MI), "Spatial Analysis Toolbox" , level=Qgis.Info)
         QgsMessageLog.logMessage('Z-score = '+str(Zscore), "Spatial Analysis Toolbox" , level=Qgis.Info)
+        if suite:
+            QgsMessageLog.logMessage('Permutations = '+str(permutations), "Spatial Analysis Toolbox" , level=Qgis.Info)
+            QgsMessageLog.logMessage('\n'+table.to_string(), "Spatial Analysis Toolbox" , level=Qgis.Info)
+        QgsMessageLog.logMessage(compare(estimate, started), "Spatial Analysis Toolbox" , level=Qgis.Info)
+
+        if useCache:
+            cacheStore(key, results, limitMB=cacheSize)
+            results['Cache'] = 'miss'
+
+        # Results table (one row)
+        row = moranRow(layerSource.sourceName(), variable, results['3_Method'], y.shape[0], (MI, EI, Zscore, Pvalue, PseudoP), suiteResults if suite else None)
+        tableId = outputTable(self, parameters, self.TABLE, context, resultsTable([row], MORAN_COLUMNS))
+        if tableId is not None:
+            results[self.TABLE] = tableId
         
         return results
 
+    def batch(self, parameters, context, feedback, layers, variables, methods, knn_dist, suite, permutations, workers):
+        """Exact Moran's I of every layer x variable x method, the layers in parallel in the worker processes."""
+        tasks = []
+        try:
+            for layer in layers:
+                # Variables missing from a layer and contiguity methods of point layers are skipped
+                fields = [v for v in variables if layer.fields().indexOf(v) >= 0]
+                layerMethods = [m for m in methods if not (layer.geometryType() == 0 and m in (0, 1))]
+                for v in variables:
+                    if v not in fields:
+                        feedback.reportError('{}: no field {}, skipped'.format(layer.sourceName(), v))
+                if len(layerMethods) < len(methods):
+                    feedback.reportError('{}: contiguity methods are not available with point layers, skipped'.format(layer.sourceName()))
+                if fields and layerMethods:
+                    # Layers are cloned here (QGIS), the workers only read files
+                    tasks.append((layerFile(layer), layer.sourceName(), fields, layerMethods, knn_dist, suite, permutations))
+            if not tasks:
+                return {'Error':'No layer with the variables and methods to calculate'}
+
+            feedback.pushInfo('{} layers, {} workers'.format(len(tasks), min(workers, len(tasks))))
+            table = resultsTable(runBatch(moranRows, tasks, workers, feedback), MORAN_COLUMNS)
+        finally:
+            # Temp files of the non GeoParquet / Feather layers
+            removeTemp([task[0] for task in tasks])
+
+        results = {}
+        tableId = outputTable(self, parameters, self.TABLE, context, table)
+        if tableId is not None:
+            results[self.TABLE] = tableId
+        results['1_Layers'] = len(tasks)
+        results['2_Rows'] = len(table)
+        results['3_Results table'] = table.round(5).to_string()
+
+        QgsMessageLog.logMessage('===== Morans I (batch) =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layers: {}, variables: {}, methods: {}'.format(len(tasks), len(variables), len(methods)), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('\n' + results['3_Results table'], "Spatial Analysis Toolbox", level=Qgis.Info)
+        return results
+
     def name(self):
         return 'moransi'
 
@@ -115,7 +296,21 @@ class MoransI(QgsProcessingAlgorithm):
         		"- Queen contiguity in which areas with common edges or corners are considered neighbors (works only for polygon layers).\n"
         		"- K Nearest Neighbors (works with point/polygon* layers).\n"
        			"- Distance Band, in which areas or points within a fixed distance are considered neighbors (works with point/polygon* layers).\n"
-      			"*In KNN and Distance Band, Morans I for polygon layers is calculated based on their centroids.")
+      			"*In KNN and Distance Band, Morans I for polygon layers is calculated based on their centroids.\n"
+      			"For layers in a geographic CRS (e.g. EPSG:4326), KNN and Distance Band use great circle distances, with the distance threshold in km.\n"
+      			"Optionally, Geary's C and Getis-Ord General G are calculated together with Moran's I from the same weights, with permutation tests sharing the same draws. "
+      			"General G uses binary weights and requires a non-negative variable.\n"
+      			"With the result cache, a run with the same variable values, geometries and parameters as a previous one returns the stored results (Cache: hit).\n"
+      			"Before the run, the memory and runtime are estimated. If libpysal weights would exceed the memory budget, sparse weights are used instead.\n"
+      			"Approximate mode (for a first look at very large layers): Moran's I is estimated from random or spatially stratified samples of features, "
+      			"with their neighbors from the whole layer. The mean of the samples is reported with a 95% confidence interval and the elapsed time; "
+      			"a larger sample size or more samples give a narrower interval, the time budget (counted from the start of the run, reading the layer included) "
+      			"stops the sampling early. With KNN and Distance Band only the variable and the centroids are read.\n"
+      			"Results table: optionally the results are also written to a table, one row per layer x variable x method.\n"
+      			"Batch: with additional layers, variables or methods, the exact Moran's I (and the optional Geary's C / General G) of every combination "
+      			"is calculated with sparse weights, the layers in parallel in worker processes. Variables missing from a layer are skipped, "
+      			"as are contiguity methods for point layers. A batch run is always exact and uncached: the approximate mode, "
+      			"the result cache, the cache size limit and the memory budget do not apply (each one that is set is reported).")
     
     def createInstance(self):
         return MoransI()
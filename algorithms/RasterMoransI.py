@@ -0,0 +1,131 @@
+"""
+***************************************************************************
+    RasterMoransI.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessingAlgorithm,
+                          QgsProcessingParameterRasterLayer,
+                          QgsProcessingParameterBand,
+                          QgsProcessingParameterEnum,
+                          QgsProcessingParameterRasterDestination,
+                          QgsMessageLog,
+                          Qgis)
+from osgeo import gdal
+import numpy as np
+from .lattice import rasterMoran, blockRows
+from .preflight import estimateRasterMoran, start, compare, describe
+
+
+class RasterMoransI(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    BAND = 'BAND'
+    METHOD = 'METHOD'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer(self.INPUT, 'Input raster', defaultValue=None))
+        self.addParameter(QgsProcessingParameterBand(self.BAND, 'Band', parentLayerParameterName=self.INPUT, defaultValue=1))
+        self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Neighborhood', options=['Queen contiguity', 'Rook contiguity'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterRasterDestination(self.OUTPUT, 'Local Moran (I, P-value, Quadrant)', optional=True, createByDefault=True, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        rasterLayer = self.parameterAsRasterLayer(parameters, self.INPUT, context)
+        bandNumber = self.parameterAsInt(parameters, self.BAND, context)
+        method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1
+        outPath = self.parameterAsOutputLayer(parameters, self.OUTPUT, context)
+
+        dataset = gdal.Open(rasterLayer.source(), gdal.GA_ReadOnly)
+        if dataset is None:
+            return {'Error':'The raster cannot be opened with GDAL'}
+        band = dataset.GetRasterBand(bandNumber)
+        cols, rows = dataset.RasterXSize, dataset.RasterYSize
+        nodata = band.GetNoDataValue()
+
+        # Blocks of whole rows, aligned to the block height of the band (windowed reads, never the whole raster)
+        blockHeight = band.GetBlockSize()[1]
+        rowsPerBlock = blockRows(cols, blockHeight)
+        estimate = estimateRasterMoran(cols * rows, cols, rowsPerBlock)
+        model_feedback.pushInfo('{} x {} cells, blocks of {} rows. Pre-flight estimate: {}'.format(cols, rows, rowsPerBlock, describe(estimate)))
+
+        def readRows(r0, r1):
+            return band.ReadAsArray(0, r0, cols, r1 - r0)
+
+        # Local statistics, written block by block to a 3 band GeoTIFF
+        writeRows = None
+        out = None
+        if outPath:
+            driver = gdal.GetDriverByName('GTiff')
+            out = driver.Create(outPath, cols, rows, 3, gdal.GDT_Float32, options=['TILED=YES', 'COMPRESS=LZW', 'BIGTIFF=IF_SAFER'])
+            out.SetGeoTransform(dataset.GetGeoTransform())
+            out.SetProjection(dataset.GetProjection())
+            for i, description in enumerate(['Local Moran I', 'P-value', 'Quadrant']):
+                out.GetRasterBand(i + 1).SetNoDataValue(-9999)
+                out.GetRasterBand(i + 1).SetDescription(description)
+
+            def writeRows(r0, I, P, Q):
+                for i, values in enumerate([np.nan_to_num(I, nan=-9999), np.nan_to_num(P, nan=-9999), np.where(np.isnan(I), -9999, Q)]):
+                    out.GetRasterBand(i + 1).WriteArray(values.astype(np.float32), 0, r0)
+
+        started = start()
+        try:
+            res = rasterMoran(readRows, rows, cols, method, nodata, rowsPerBlock, writeRows, model_feedback)
+        except ValueError as e:
+            return {'Error':str(e)}
+        finally:
+            if out is not None:
+                out.FlushCache()
+                out = None
+            dataset = None
+        if not res:
+            return {}
+
+        # Results
+        results = {}
+        if outPath:
+            results[self.OUTPUT] = outPath
+        results['1_Raster: '] = 'Raster: '+str(rasterLayer.name())+', band '+str(bandNumber)
+        results['2_Method'] = 'Queen contiguity' if method == 0 else 'Rook contiguity'
+        results['3_Valid cells'] = res['cells']
+        results['4_Morans-I'] = round(res['I'],5)
+        results['5_Expected Value'] = round(res['EI'],5)
+        results['6_Z-score'] = round(res['z'],5)
+        results['7_P-value'] = res['p']
+
+        QgsMessageLog.logMessage('===== Raster Morans I =====', "Spatial Analysis Toolbox", level=Qgis.Info)
+        for k in ['1_Raster: ', '2_Method', '3_Valid cells', '4_Morans-I', '5_Expected Value', '6_Z-score', '7_P-value']:
+            QgsMessageLog.logMessage('{} {}'.format(k[2:], results[k]), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage(compare(estimate, started), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return results
+
+    def name(self):
+        return 'rastermoransi'
+
+    def displayName(self):
+        return "Raster Moran's I / LISA"
+
+    def shortHelpString(self):
+        return ("Moran's I and Local Moran's I (LISA) of a raster band, with the cells as observations. \n"
+        		"The neighbors of every cell are the valid cells of its 3 x 3 window:\n"
+        		"- Queen contiguity: the 8 surrounding cells.\n"
+        		"- Rook contiguity: the 4 cells sharing an edge.\n"
+        		"The weights are row standardized and nodata cells are left out (cells next to nodata have fewer neighbors). "
+        		"The raster is read in blocks of rows, and the lags are shifted sums over every block, "
+        		"so the runtime grows linearly with the number of cells, the memory is bounded by one block and rasters larger than the memory can be used.\n"
+        		"Moran's I is reported with its Z-score and P-value under normality. "
+        		"The optional output is a GeoTIFF with three bands: Local Moran's I, the P-value of its z-score (analytical moments, as in Local Moran's I for large layers) "
+        		"and the quadrant (1 = HH, 2 = LH, 3 = LL, 4 = HL).")
+
+    def createInstance(self):
+        return RasterMoransI()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
@@ -0,0 +1,123 @@
+"""
+***************************************************************************
+    SpatialRegression.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import    (QgsProcessing,
+                          QgsProcessingAlgorithm,
+                          QgsProcessingParameterVectorLayer,
+                          QgsProcessingParameterField,
+                          QgsProcessingParameterNumber,
+                          QgsProcessingParameterEnum,
+                          QgsProcessingParameterFeatureSink,
+                          QgsMessageLog,
+                          Qgis)
+import pandas as pd
+import numpy as np
+from .weights import METHODS, buildWeights, methodDescription
+from .econometrics import LOGDET_METHODS, logDeterminant, spatialLag, spatialError, coefficientTable
+from .layerio import readLayer, outputLayer
+
+class SpatialRegression(QgsProcessingAlgorithm):
+    INPUT = 'INPUT'
+    DEP = 'DEP'
+    INDEP = 'INDEP'
+    MODEL = 'MODEL'
+    METHOD = 'METHOD'
+    KNN_DIST = 'KNN_DIST'
+    LOGDET = 'LOGDET'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, 'Input layer', types=[QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorPoint],  defaultValue=None))
+        self.addParameter(QgsProcessingParameterField(self.INDEP, 'Independent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=True))
+        self.addParameter(QgsProcessingParameterField(self.DEP, 'Dependent Variable', type=QgsProcessingParameterField.Numeric, parentLayerParameterName=self.INPUT, allowMultiple=False, defaultValue=''))
+        self.addParameter(QgsProcessingParameterEnum(self.MODEL, 'Model', options = ['Spatial lag', 'Spatial error'], defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(self.METHOD, 'Method', options = METHODS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(self.KNN_DIST, type = QgsProcessingParameterNumber.Integer,description='K Neighbors / Distance threshold (only for KNN / Distance Band methods)', defaultValue = 1, minValue = 1))
+        self.addParameter(QgsProcessingParameterEnum(self.LOGDET, 'Log-determinant', options = LOGDET_METHODS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Spatial Regression', createByDefault=True, supportsAppend=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        layerSource = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        yField = self.parameterAsFields(parameters, self.DEP, context)[0]
+        xFields = self.parameterAsFields(parameters, self.INDEP, context)
+        model = self.parameterAsInt(parameters, self.MODEL, context)        # Lag = 0, Error = 1
+        method = self.parameterAsInt(parameters, self.METHOD, context)       # Queen = 0, Rook = 1, KNN = 2, Distance = 3
+        knn_dist = self.parameterAsDouble(parameters, self.KNN_DIST, context)
+        logdetMethod = self.parameterAsInt(parameters, self.LOGDET, context)  # LU = 0, Chebyshev = 1, Monte Carlo = 2
+
+        if yField in xFields:
+            return {'Error':'A variable cannot be both Dependent and Independent'}
+        if layerSource.geometryType() == 0 and (method == 0 or method == 1):
+            return  {'Error':'This method is not available with point layers'}
+
+        # Layer as geodataframe (GeoParquet / Feather read directly)
+        data = readLayer(layerSource)
+
+        # Row standardized sparse weights
+        w = buildWeights(data, method, knn_dist)
+        w.transform = 'r'
+        W = w.sparse.tocsr()
+
+        # Arrays with variables, constant first
+        X = np.hstack([np.ones((data.shape[0], 1)), data[xFields].to_numpy(dtype=float)])
+        y = data[yField].to_numpy(dtype=float)
+        cols = ['X0_Const'] + ['X{}_{}'.format(str(i+1),str(fld)) for i, fld in enumerate(xFields)]
+
+        # ln|I - rho W| once (LU) or from traces estimated once (Chebyshev / Monte Carlo)
+        logdet = logDeterminant(W, logdetMethod)
+        if model == 0:
+            res = spatialLag(y, X, W, logdet)
+            parameter = 'Rho'
+        elif model == 1:
+            res = spatialError(y, X, W, logdet)
+            parameter = 'Lambda'
+        table = pd.DataFrame(coefficientTable(cols + [parameter], res), columns=['Variable', 'Coefficient', 'Std.Error', 'z-value', 'P-value']).set_index('Variable')
+
+        # Join to gdf
+        reg = data.join(pd.DataFrame(res['predicted'], columns = ['predY']))
+        reg = reg.join(pd.DataFrame(res['residuals'], columns = ['residuals']))
+        reg.loc[:, ['predY', 'residuals']] = reg[['predY', 'residuals']].round(4)
+
+        # Output & Load to QGIS (GeoParquet destinations are written directly)
+        dest_id, outPath = outputLayer(self, parameters, self.OUTPUT, context, reg, layerSource.crs(), 'Spatial Regression')
+
+        # Log Messages
+        QgsMessageLog.logMessage('===== {} model ====='.format('Spatial lag' if model == 0 else 'Spatial error'), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Layer: '+str(layerSource.sourceName()), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Dependent Variable: '+str(yField), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Method: '+methodDescription(method, knn_dist), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Log-determinant: '+LOGDET_METHODS[logdetMethod], "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('\n'+table.to_string(), "Spatial Analysis Toolbox", level=Qgis.Info)
+        QgsMessageLog.logMessage('Log-likelihood = {}, AIC = {}, Pseudo R2 = {}, Sigma2 = {}'.format(res['logLik'], res['AIC'], res['pseudoR2'], res['sigma2']), "Spatial Analysis Toolbox", level=Qgis.Info)
+
+        return {'OUTPUT':dest_id, parameter:round(res['parameter'],5), 'Log-likelihood':round(res['logLik'],3),
+                'AIC':round(res['AIC'],3), 'Pseudo R2':round(res['pseudoR2'],3), 'Results': 'Check Log Message for more'}
+
+    def name(self):
+        return 'spatialregression'
+
+    def displayName(self):
+        return 'Spatial Lag / Spatial Error Regression'
+
+    def shortHelpString(self):
+        return ("Maximum likelihood spatial lag (y = rho Wy + Xb + e) and spatial error (y = Xb + u, u = lambda Wu + e) models. \n"
+        		"The spatial weights (row standardized) are defined with the same methods as in Moran's I.\n"
+        		"The log-determinant ln|I - rho W| can be calculated exactly from a sparse LU factorization, "
+        		"or approximated with Chebyshev polynomials or Monte Carlo trace estimates, which are faster for very large layers.\n"
+        		"The output layer has the predicted values (predY) and residuals. The coefficients are reported in the Log Messages.")
+
+    def createInstance(self):
+        return SpatialRegression()
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        import os
+        pluginPath = os.path.dirname(__file__)
+        return QIcon(os.path.join(pluginPath,'styles','icon.png'))
@@ -0,0 +1,122 @@
+"""
+***************************************************************************
+    autocorrelation.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+from scipy.stats import norm
+
+# Max number of elements in one block of permuted variables
+CHUNK = 2 ** 22
+
+STATISTICS = ("Moran's I", "Geary's C", 'General G')
+
+
+def _weightSums(W):
+    # s0, s1, s2 of a sparse weights matrix
+    Wt = W.T.tocsr()
+    s0 = W.sum()
+    s1 = 0.5 * (W + Wt).multiply(W + Wt).sum()
+    s2 = ((np.asarray(W.sum(axis=1)).ravel() + np.asarray(W.sum(axis=0)).ravel()) ** 2).sum()
+    return s0, s1, s2
+
+
+def _pseudoP(sims, observed, permutations):
+    larger = (sims >= observed).sum()
+    if (permutations - larger) < larger:
+        larger = permutations - larger
+    return (larger + 1.0) / (permutations + 1.0)
+
+
+def globalAutocorrelation(y, W, permutations=999, seed=None, statistics=STATISTICS):
+    """Moran's I, Geary's C and Getis-Ord General G from one variable and one weights matrix.
+
+    W is the binary (or general) sparse weights matrix. Moran's I and Geary's C
+    use its row-standardized form, General G uses it as is, as in esda. All
+    three statistics come from the same product W @ y, and the permutation
+    tests share the same draws and one product per block of permutations.
+    Only the given statistics (names in STATISTICS) are calculated and permuted.
+    Returns {statistic: (value, expected value, z-score, p-value, pseudo p-value)}.
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    W = W.tocsr().astype(float)
+    rowSums = np.asarray(W.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        rowScale = np.where(rowSums > 0, 1.0 / rowSums, 0.0)
+    Wr = W.multiply(rowScale[:, None]).tocsr()
+    rowSumsR = np.asarray(Wr.sum(axis=1)).ravel()
+    colSumsR = np.asarray(Wr.sum(axis=0)).ravel()
+
+    if 'General G' in statistics:
+        s0b, s1b, s2b = _weightSums(W)
+    s0, s1, s2 = _weightSums(Wr)
+    sumY = y.sum()
+    sumY2 = (y ** 2).sum()
+
+    # Statistics for one or many (columns) arrangements of y, from the lags W @ Y
+    def compute(Y, lagB):
+        stats = {}
+        if "Moran's I" in statistics or "Geary's C" in statistics:
+            Y2 = Y ** 2
+            ym = Y.mean(axis=0)
+            ss = (Y2.sum(axis=0) - n * ym ** 2)
+            lagR = lagB * rowScale[:, None]
+            cross = (Y * lagR).sum(axis=0)
+        if "Moran's I" in statistics:
+            moranNum = cross - ym * (lagR.sum(axis=0) + (Y * rowSumsR[:, None]).sum(axis=0)) + ym ** 2 * s0
+            stats["Moran's I"] = (n / s0) * moranNum / ss
+        if "Geary's C" in statistics:
+            gearyNum = (Y2 * rowSumsR[:, None]).sum(axis=0) + (Y2 * colSumsR[:, None]).sum(axis=0) - 2 * cross
+            stats["Geary's C"] = (n - 1) * gearyNum / (2 * s0 * ss)
+        if 'General G' in statistics:
+            stats['General G'] = (Y * lagB).sum(axis=0) / (sumY ** 2 - sumY2)
+        return stats
+
+    observed = {name: float(stat[0]) for name, stat in compute(y[:, None], (W @ y)[:, None]).items()}
+
+    # Permutations, in blocks, all the statistics from the same product
+    rng = np.random.default_rng(seed)
+    sims = {name: np.empty(permutations) for name in observed}
+    step = max(1, CHUNK // max(n, 1))
+    for start in range(0, permutations, step):
+        stop = min(permutations, start + step)
+        Y = np.column_stack([y[rng.permutation(n)] for p in range(start, stop)])
+        for name, stat in compute(Y, W @ Y).items():
+            sims[name][start:stop] = stat
+
+    results = {}
+
+    # Moran's I, normality assumption
+    if "Moran's I" in statistics:
+        EI = -1.0 / (n - 1)
+        VI = (n * n * s1 - n * s2 + 3 * s0 * s0) / ((n * n - 1) * s0 * s0) - EI ** 2
+        zI = (observed["Moran's I"] - EI) / np.sqrt(VI)
+        results["Moran's I"] = (observed["Moran's I"], EI, zI, 2.0 * norm.sf(abs(zI)), _pseudoP(sims["Moran's I"], observed["Moran's I"], permutations))
+
+    # Geary's C, normality assumption
+    if "Geary's C" in statistics:
+        EC = 1.0
+        VC = ((2 * s1 + s2) * (n - 1) - 4 * s0 * s0) / (2 * (n + 1) * s0 * s0)
+        zC = (observed["Geary's C"] - EC) / np.sqrt(VC)
+        results["Geary's C"] = (observed["Geary's C"], EC, zC, norm.sf(abs(zC)), _pseudoP(sims["Geary's C"], observed["Geary's C"], permutations))
+
+    # General G, randomization assumption
+    if 'General G' in statistics:
+        EG = s0b / (n * (n - 1))
+        b0 = (n * n - 3 * n + 3) * s1b - n * s2b + 3 * s0b ** 2
+        b1 = -1.0 * ((n * n - n) * s1b - 2 * n * s2b + 6 * s0b ** 2)
+        b2 = -1.0 * (2 * n * s1b - (n + 3) * s2b + 6 * s0b ** 2)
+        b3 = 4 * (n - 1) * s1b - 2 * (n + 1) * s2b + 8 * s0b ** 2
+        b4 = s1b - s2b + s0b ** 2
+        EG2 = b0 * sumY2 ** 2 + b1 * (y ** 4).sum() + b2 * sumY ** 2 * sumY2 + b3 * sumY * (y ** 3).sum() + b4 * sumY ** 4
+        EG2 = EG2 / ((sumY ** 2 - sumY2) ** 2 * n * (n - 1) * (n - 2) * (n - 3))
+        zG = (observed['General G'] - EG) / np.sqrt(EG2 - EG ** 2)
+        results['General G'] = (observed['General G'], EG, zG, norm.sf(abs(zG)), _pseudoP(sims['General G'], observed['General G'], permutations))
+
+    return results
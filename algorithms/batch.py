@@ -0,0 +1,120 @@
+"""
+***************************************************************************
+    batch.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from .autocorrelation import globalAutocorrelation, STATISTICS
+from .weights import sparseWeights, methodDescription
+from .layerio import readFile, readAttributes
+from .parallel import processPool
+
+CORRELATION_METHODS = ['pearson', 'kendall', 'spearman']
+
+# Columns of the results tables, one row per layer x variable (pair) x method
+MORAN_COLUMNS = ['layer', 'variable', 'method', 'features', 'morans_i', 'expected', 'z_score', 'p_value', 'pseudo_p']
+CORRELATION_COLUMNS = ['layer', 'variable_1', 'variable_2', 'method', 'features', 'correlation']
+
+
+def moranRow(layer, variable, method, n, moran, suite=None):
+    """Row of the Moran's I table. moran is (I, expected, z, p, pseudo p), suite the
+    results of globalAutocorrelation for Geary's C and General G (or None)."""
+    row = dict(zip(MORAN_COLUMNS, [layer, variable, method, n] + [np.nan if v is None else float(v) for v in moran]))
+    if suite is not None:
+        for name, prefix in (("Geary's C", 'gearys_c'), ('General G', 'general_g')):
+            value, expected, z, p, pseudo = suite[name]
+            row.update({prefix: value, prefix + '_z': z, prefix + '_p': p, prefix + '_pseudo_p': pseudo})
+    return row
+
+
+def moranRows(path, layer, variables, methods, knn_dist, suite=False, permutations=999):
+    """Rows of the Moran's I table for all the variables and methods of one layer file.
+
+    Runs in the worker processes: the layer is read once, the sparse weights
+    of every method are built once and shared by the variables.
+    """
+    data = readFile(path, variables)
+    rows = []
+    for method in methods:
+        W = sparseWeights(data, method, knn_dist)
+        for variable in variables:
+            y = data[variable].to_numpy(dtype=float)
+            res = globalAutocorrelation(y, W, permutations, statistics=STATISTICS if suite else ("Moran's I",))
+            rows.append(moranRow(layer, variable, methodDescription(method, knn_dist), y.shape[0], res["Moran's I"], res if suite else None))
+    return rows
+
+
+def matrixRows(layer, corr, counts, method):
+    """Rows of the correlation table from a correlation matrix (DataFrame) and the pairwise complete counts, every pair of fields once."""
+    fields = list(corr.columns)
+    return [dict(zip(CORRELATION_COLUMNS, [layer, fields[i], fields[j], method, int(counts[i, j]), float(corr.iloc[i, j])]))
+            for i in range(len(fields)) for j in range(i + 1, len(fields))]
+
+
+def correlationRows(layer, attr, methods):
+    """Rows of the correlation table for the given methods (indices of CORRELATION_METHODS)."""
+    # Pairwise complete observations, as corr
+    valid = attr.notna().to_numpy(dtype=float)
+    counts = valid.T @ valid
+    rows = []
+    for method in methods:
+        rows += matrixRows(layer, attr.corr(method=CORRELATION_METHODS[method]), counts, CORRELATION_METHODS[method].capitalize())
+    return rows
+
+
+def correlationFileRows(path, layer, fields, methods):
+    # Worker task: one layer file, only the attributes
+    return correlationRows(layer, readAttributes(path, fields), methods)
+
+
+def runBatch(function, tasks, workers=1, feedback=None):
+    """Rows of all the tasks (argument tuples of function), in a process pool when
+    there is more than one worker and task. Failed tasks are reported and skipped."""
+    rows = []
+    if workers <= 1 or len(tasks) <= 1:
+        for done, task in enumerate(tasks):
+            rows += _runTask(function, task, feedback)
+            if feedback is not None:
+                feedback.setProgress(100 * (done + 1) / len(tasks))
+                if feedback.isCanceled():
+                    break
+        return rows
+
+    with processPool(min(workers, len(tasks))) as pool:
+        futures = {pool.submit(function, *task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures)):
+            try:
+                rows += future.result()
+            except Exception as e:
+                if feedback is not None:
+                    feedback.reportError('{}: {}'.format(futures[future][1], e))
+            if feedback is not None:
+                feedback.setProgress(100 * (done + 1) / len(tasks))
+                if feedback.isCanceled():
+                    for f in futures:
+                        f.cancel()
+                    break
+    return rows
+
+
+def _runTask(function, task, feedback):
+    try:
+        return function(*task)
+    except Exception as e:
+        if feedback is not None:
+            feedback.reportError('{}: {}'.format(task[1], e))
+        return []
+
+
+def resultsTable(rows, columns):
+    # Rows in a stable order (the pool finishes the layers in any order)
+    table = pd.DataFrame(rows, columns=columns + [c for c in (rows[0] if rows else {}) if c not in columns])
+    keys = [c for c in ['layer', 'variable', 'variable_1', 'variable_2', 'method'] if c in table.columns]
+    return table.sort_values(keys, kind='stable').reset_index(drop=True)
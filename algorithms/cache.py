@@ -0,0 +1,102 @@
+"""
+***************************************************************************
+    cache.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import QgsApplication, QgsFeatureRequest
+import hashlib, json, os, shutil, tempfile, time
+
+
+def cacheDir():
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), 'spatialanalysistoolbox', 'cache')
+
+
+def cacheKey(algorithm, values, layer, fields):
+    """Hash of the algorithm, its parameter values and the input data.
+
+    The data part covers the CRS, the geometry (WKB) and the used attributes
+    of every feature, so any edit of the inputs gives a different key.
+    """
+    h = hashlib.sha256()
+    h.update(algorithm.encode())
+    h.update(json.dumps(values, sort_keys=True, default=str).encode())
+    h.update(layer.crs().toWkt().encode())
+    request = QgsFeatureRequest().setSubsetOfAttributes(fields, layer.fields())
+    for ftr in layer.getFeatures(request):
+        h.update(bytes(ftr.geometry().asWkb()))
+        for fld in fields:
+            h.update(repr(ftr[fld]).encode())
+    return h.hexdigest()
+
+
+def cacheLookup(key):
+    # Stored results (and paths of the stored files) or None
+    entry = os.path.join(cacheDir(), key)
+    path = os.path.join(entry, 'results.json')
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+        os.utime(path)      # Recently used, last to be evicted
+        files = {name: os.path.join(entry, fileName) for name, fileName in stored['files'].items()}
+    except (ValueError, OSError, KeyError):
+        # Unreadable entry (e.g. left by an interrupted run) -> miss, the next run stores it again
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    return stored['results'], files
+
+
+def cacheStore(key, results, files=None, limitMB=1024):
+    """Store results (JSON serializable) and output files, then evict the least recently used entries.
+
+    files is {name: path}; for shapefiles all the files with the same base name are stored.
+    """
+    entry = os.path.join(cacheDir(), key)
+    os.makedirs(entry, exist_ok=True)
+    stored = {}
+    for name, path in (files or {}).items():
+        base, ext = os.path.splitext(path)
+        if ext.lower() == '.shp':
+            folder = os.path.dirname(path)
+            for fileName in os.listdir(folder):
+                if os.path.splitext(os.path.join(folder, fileName))[0] == base:
+                    shutil.copy2(os.path.join(folder, fileName), os.path.join(entry, name + os.path.splitext(fileName)[1]))
+        else:
+            shutil.copy2(path, os.path.join(entry, name + ext))
+        stored[name] = name + ext
+    # Written to a temp file and renamed, so a lookup never reads a partly written entry
+    handle, temp = tempfile.mkstemp(suffix='.tmp', dir=entry)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'results': results, 'files': stored, 'created': time.time()}, f, default=float)
+        os.replace(temp, os.path.join(entry, 'results.json'))
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    evict(limitMB)
+
+
+def _size(folder):
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+
+def evict(limitMB):
+    root = cacheDir()
+    entries = []
+    for key in os.listdir(root):
+        results = os.path.join(root, key, 'results.json')
+        if os.path.exists(results):
+            entries.append((os.path.getmtime(results), _size(os.path.join(root, key)), key))
+    total = sum(size for used, size, key in entries)
+    for used, size, key in sorted(entries):
+        if total <= limitMB * 1024 * 1024:
+            break
+        shutil.rmtree(os.path.join(root, key), ignore_errors=True)
+        total -= size
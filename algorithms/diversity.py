@@ -0,0 +1,67 @@
+"""
+***************************************************************************
+    diversity.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _proportions(counts):
+    totals = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals[:, None] > 0, counts / totals[:, None], 0.0), totals
+
+
+def _entropy(p):
+    # Entropy of every row of proportions, 0 ln 0 = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.where(p > 0, p * np.log(p), 0.0).sum(axis=1)
+
+
+def localDiversity(counts, W, includeSelf=True):
+    """Local diversity and segregation of the groups in counts (n x groups).
+
+    The counts of every neighborhood come from one sparse product W @ counts
+    (W binary, plus the feature itself if includeSelf). Returns a dict with
+    the local measures (arrays of length n):
+        entropy      normalized entropy of the neighborhood (0 - 1)
+        simpson      Simpson diversity of the neighborhood, 1 - sum p^2
+        dissimilarity  contribution of the feature to the spatial multi-group dissimilarity index
+        isolation    probability that a member of the feature meets a member of the same group in the neighborhood
+    and the global indices of the layer: 'Dissimilarity', 'Information theory H',
+    and 'Isolation' (one value per group).
+    """
+    counts = np.asarray(counts, dtype=float)
+    n, groups = counts.shape
+    if includeSelf:
+        W = W + sp.identity(n, format='csr')
+    local = W @ counts                  # Neighborhood counts
+    pLocal, tLocal = _proportions(local)
+    pOwn, t = _proportions(counts)
+
+    # Layer totals
+    T = t.sum()
+    P = counts.sum(axis=0) / T
+    E = _entropy(P[None, :])[0]
+    I = (P * (1 - P)).sum()
+
+    entropy = _entropy(pLocal) / np.log(groups)
+    simpson = np.where(tLocal > 0, 1 - (pLocal * pLocal).sum(axis=1), 0.0)
+
+    # Spatial multi-group indices (Reardon & O'Sullivan 2004): the population of
+    # every feature weighted by the composition of its neighborhood
+    dissimilarity = t * np.abs(pLocal - P).sum(axis=1) / (2 * T * I)
+    information = t * (E - _entropy(pLocal)) / (E * T)
+    isolation = (pOwn * pLocal).sum(axis=1)
+    groupTotals = counts.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        groupIsolation = np.where(groupTotals > 0, (counts / groupTotals * pLocal).sum(axis=0), 0.0)
+
+    return {'entropy': entropy, 'simpson': simpson, 'dissimilarity': dissimilarity, 'isolation': isolation,
+            'Dissimilarity': dissimilarity.sum(), 'Information theory H': information.sum(), 'Isolation': groupIsolation}
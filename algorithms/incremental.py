@@ -0,0 +1,178 @@
+"""
+***************************************************************************
+    incremental.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import hashlib, json, os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+from .weights import neighborCoordinates, searchRadius, sparseWeights, binaryMatrix, knnPairs, distancePairs, contiguityPairs
+from .lisa import localMoranMoments
+
+STATE_VERSION = 1
+
+
+def geometryHashes(data):
+    # Stable (across sessions) 64 bit hashes of the WKB of every geometry
+    return np.array([int.from_bytes(hashlib.blake2b(wkb or b'', digest_size=8).digest(), 'little', signed=True)
+                     for wkb in data.geometry.to_wkb()], dtype=np.int64)
+
+
+def updateWeights(Wold, oldIndex, data, method, knn_dist, moved):
+    """Weights of the current features from the weights of the previous run.
+
+    oldIndex is the row of every current feature in the previous run (-1 for
+    added features) and moved flags the features whose geometry changed.
+    Only the neighborhoods of added, moved and removed features are searched
+    again. Returns the new weights and the rows whose neighbors changed.
+    """
+    n = data.shape[0]
+    stable = (oldIndex >= 0) & ~moved
+    P = sp.csr_matrix((np.ones(stable.sum()), (np.flatnonzero(stable), oldIndex[stable])), shape=(n, Wold.shape[0]))
+    kept = (P @ Wold @ P.T).tocsr()
+    lost = np.zeros(n, dtype=bool)
+    lost[stable] = np.diff(kept.indptr)[stable] != np.diff(Wold.indptr)[oldIndex[stable]]
+    changed = ~stable | lost
+    rows = np.flatnonzero(~stable)
+
+    if method == 0 or method == 1:
+        r, c = contiguityPairs(data, rows, method)
+        W = kept + binaryMatrix(r, c, n)
+    else:
+        coords = neighborCoordinates(data)
+        tree = cKDTree(coords)
+        if method == 3:
+            r, c = distancePairs(coords, tree, rows, searchRadius(data, knn_dist))
+            W = kept + binaryMatrix(r, c, n)
+        else:
+            # Features that lost a neighbor, or have a new/moved feature closer than their k-th neighbor
+            recompute = ~stable | lost
+            if len(rows):
+                K = kept.tocoo()
+                far = np.zeros(n)
+                np.maximum.at(far, K.row, np.linalg.norm(coords[K.row] - coords[K.col], axis=1))
+                nearest = cKDTree(coords[rows]).query(coords, k=1)[0]
+                recompute |= nearest <= far
+            rows = np.flatnonzero(recompute)
+            r, c = knnPairs(coords, tree, rows, int(knn_dist))
+            keepRows = sp.diags((~recompute).astype(float))
+            W = keepRows @ kept + binaryMatrix(r, c, n)
+
+    W = W.tocsr()
+    W.data[:] = 1.0
+    W.sort_indices()
+    changed |= np.diff((W != kept).tocsr().indptr) > 0
+    return W, changed
+
+
+def _rowStandardized(W):
+    rowSums = np.asarray(W.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        return sp.diags(np.where(rowSums > 0, 1.0 / rowSums, 0.0)) @ W
+
+
+def _fullLags(data, y, method, knn_dist):
+    # Binary weights, row standardized weights and lags of all the features
+    W = sparseWeights(data, method, knn_dist)
+    Wr = _rowStandardized(W).tocsr()
+    return W, Wr, Wr @ y
+
+
+def _moments(y, Wr, lag):
+    rowSums = np.asarray(Wr.sum(axis=1)).ravel()
+    rowSquares = np.asarray(Wr.multiply(Wr).sum(axis=1)).ravel()
+    return localMoranMoments(y, lag, rowSums, rowSquares)
+
+
+def analyticLocalMoran(data, field, method, knn_dist):
+    """Local Moran's I with the analytical p-values of localMoranMoments, without state.
+
+    The same weights and statistics as the full run of incrementalLocalMoran,
+    so a run with and a run without a state file give the same output.
+    Returns LMI, LMP and LMQ.
+    """
+    y = data[field].to_numpy(dtype=float)
+    W, Wr, lag = _fullLags(data, y, method, knn_dist)
+    return _moments(y, Wr, lag)
+
+
+def loadState(path):
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as f:
+        state = {key: f[key] for key in f.files}
+    state['meta'] = json.loads(str(state['meta']))
+    if state['meta'].get('version') != STATE_VERSION:
+        return None
+    state['W'] = sp.csr_matrix((state['data'], state['indices'], state['indptr']), shape=tuple(state['shape']))
+    return state
+
+
+def saveState(path, meta, keys, y, hashes, W, lag, I, q):
+    meta = dict(meta, version=STATE_VERSION)
+    np.savez_compressed(path, meta=json.dumps(meta), keys=keys, y=y, hashes=hashes,
+                        data=W.data, indices=W.indices, indptr=W.indptr, shape=np.array(W.shape),
+                        lag=lag, I=I, q=q)
+
+
+def incrementalLocalMoran(data, field, keys, method, knn_dist, statePath):
+    """Local Moran's I, reusing the weights and lags of the previous run stored in statePath.
+
+    Features are matched on keys. Changed, added and removed features are
+    detected from the variable and geometry hashes; only the neighborhoods of
+    those features get new weights and lags, the global moments and the
+    statistics (analytical, conditional randomization) are then O(n) array
+    operations. The output is identical to a run without previous state
+    (analyticLocalMoran).
+    Returns LMI, LMP, LMQ and a summary of the update.
+    """
+    keys = np.asarray([str(k) for k in keys])
+    if len(np.unique(keys)) != len(keys):
+        raise ValueError('The feature ids are not unique')
+    y = data[field].to_numpy(dtype=float)
+    hashes = geometryHashes(data)
+    n = data.shape[0]
+    meta = {'field': field, 'method': method, 'knn_dist': knn_dist}
+
+    state = loadState(statePath)
+    if state is None or state['meta'].get('field') != field or state['meta'].get('method') != method or state['meta'].get('knn_dist') != knn_dist:
+        W, Wr, lag = _fullLags(data, y, method, knn_dist)
+        summary = {'mode': 'full', 'features': n}
+        previousQ = None
+    else:
+        oldIndex = pd.Index(state['keys']).get_indexer(keys)
+        found = oldIndex >= 0
+        moved = found.copy()
+        moved[found] = state['hashes'][oldIndex[found]] != hashes[found]
+        moved |= ~found
+        edited = np.zeros(n, dtype=bool)
+        edited[found] = ~np.isclose(state['y'][oldIndex[found]], y[found], rtol=0, atol=0, equal_nan=True)
+        removed = state['keys'].shape[0] - found.sum()
+
+        W, changedRows = updateWeights(state['W'], oldIndex, data, method, knn_dist, moved)
+        Wr = _rowStandardized(W).tocsr()
+
+        # Lags of rows with new neighbors or with edited neighbors, the rest is reused
+        affected = changedRows | (np.asarray(W[:, np.flatnonzero(edited)].sum(axis=1)).ravel() > 0)
+        lag = np.zeros(n)
+        lag[found] = state['lag'][oldIndex[found]]
+        rows = np.flatnonzero(affected)
+        lag[rows] = Wr[rows] @ y
+        summary = {'mode': 'incremental', 'features': n, 'added': int((~found).sum()), 'removed': int(removed),
+                   'moved': int((moved & found).sum()), 'edited': int(edited.sum()), 'recomputed lags': int(len(rows))}
+        previousQ = np.zeros(n, dtype=int)
+        previousQ[found] = state['q'][oldIndex[found]]
+
+    LMI, LMP, LMQ = _moments(y, Wr, lag)
+    if previousQ is not None:
+        summary['changed category'] = int((previousQ != LMQ).sum())
+
+    saveState(statePath, meta, keys, y, hashes, W, lag, LMI, LMQ)
+    return LMI, LMP, LMQ, summary
@@ -0,0 +1,116 @@
+"""
+***************************************************************************
+    lattice.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+from scipy.stats import norm
+from .lisa import localMoranDeviations
+
+# Neighbor cells (row, column offsets): Queen = 0, Rook = 1
+OFFSETS = {0: [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)],
+           1: [(-1, 0), (0, -1), (0, 1), (1, 0)]}
+
+
+def _neighborSum(a, offsets, halo):
+    # Sum of the neighbor cells (3 x 3 convolution) for the rows of a without the halo rows
+    rows = a.shape[0] - 2 * halo
+    cols = a.shape[1]
+    padded = np.pad(a, ((0, 0), (1, 1)))
+    out = np.zeros((rows, cols))
+    for dr, dc in offsets:
+        out += padded[halo + dr:halo + dr + rows, 1 + dc:1 + dc + cols]
+    return out
+
+
+def _readBlock(readRows, r0, r1, nRows, halo, nodata):
+    # Rows r0 - halo .. r1 + halo as float, cells outside the raster or nodata are nan
+    a0, a1 = max(r0 - halo, 0), min(r1 + halo, nRows)
+    v = np.array(readRows(a0, a1), dtype=float)
+    if nodata is not None:
+        v[v == nodata] = np.nan
+    return np.pad(v, ((a0 - (r0 - halo), (r1 + halo) - a1), (0, 0)), constant_values=np.nan)
+
+
+def blockRows(nCols, blockHeight=1, cells=2 ** 22):
+    # Rows per block, a multiple of the block height of the raster
+    rows = max(1, cells // max(nCols, 1))
+    return max(blockHeight, rows - rows % max(blockHeight, 1))
+
+
+def rasterMoran(readRows, nRows, nCols, method=0, nodata=None, rowsPerBlock=256, writeRows=None, feedback=None):
+    """Moran's I (and optionally Local Moran's I) of a raster band with lattice neighbors.
+
+    readRows(r0, r1) returns the rows r0..r1-1 of the band. The neighbors are
+    the valid cells of the 3 x 3 window (Queen = 0, Rook = 1), row
+    standardized, so every sum is a shifted sum over a block of rows plus a
+    halo of two rows: O(cells) time, O(block) memory. nodata and nan cells are
+    left out. If writeRows(r0, I, P, Q) is given, the local statistics of
+    every block are passed to it (nan / 0 for nodata). Returns the global
+    statistics in a dict.
+    """
+    offsets = OFFSETS[method]
+
+    # Pass 1: mean and sum of squared deviations (shifted sums)
+    n = 0
+    shift = None
+    s = s2 = 0.0
+    for r0 in range(0, nRows, rowsPerBlock):
+        v = _readBlock(readRows, r0, min(r0 + rowsPerBlock, nRows), nRows, 0, nodata)
+        v = v[~np.isnan(v)]
+        if v.size == 0:
+            continue
+        if shift is None:
+            shift = v.mean()
+        n += v.size
+        s += (v - shift).sum()
+        s2 += ((v - shift) ** 2).sum()
+    if n < 3:
+        raise ValueError('Too few valid cells')
+    mean = shift + s / n
+    ss = s2 - s * s / n
+
+    # Pass 2: lags, weights sums and local statistics, block by block
+    cross = S0 = S1 = S2 = 0.0
+    for r0 in range(0, nRows, rowsPerBlock):
+        r1 = min(r0 + rowsPerBlock, nRows)
+        v = _readBlock(readRows, r0, r1, nRows, 2, nodata)
+        valid = ~np.isnan(v)
+        z = np.where(valid, v - mean, 0.0)
+
+        # Valid neighbors and inverse (row standardized weight) for the rows r0 - 1 .. r1
+        count = _neighborSum(valid.astype(float), offsets, 1)
+        with np.errstate(divide='ignore'):
+            inv = np.where(valid[1:-1] & (count > 0), 1.0 / count, 0.0)
+
+        validBlock = valid[2:-2]
+        zBlock = z[2:-2]
+        countBlock = count[1:-1]
+        invBlock = inv[1:-1]
+        rowSums = (validBlock & (countBlock > 0)).astype(float)
+        lag = _neighborSum(z, offsets, 2) * invBlock                  # Lag of the deviations
+        neighborInv = _neighborSum(inv, offsets, 1)                   # Column sums of the weights
+
+        cross += (zBlock * lag)[validBlock].sum()
+        S0 += rowSums.sum()
+        S1 += (invBlock + invBlock * neighborInv)[validBlock].sum()
+        S2 += ((rowSums + neighborInv) ** 2)[validBlock].sum()
+
+        if writeRows is not None:
+            I, P, Q = localMoranDeviations(zBlock, lag, rowSums, invBlock, n, ss)
+            writeRows(r0, np.where(validBlock, I, np.nan), np.where(validBlock, P, np.nan), np.where(validBlock, Q, 0))
+        if feedback is not None:
+            feedback.setProgress(100 * r1 / nRows)
+            if feedback.isCanceled():
+                return {}
+
+    I = n / S0 * cross / ss
+    EI = -1.0 / (n - 1)
+    VI = (n * n * S1 - n * S2 + 3 * S0 * S0) / ((n * n - 1) * S0 * S0) - EI ** 2
+    zI = (I - EI) / np.sqrt(VI)
+    return {'I': I, 'EI': EI, 'z': zI, 'p': 2.0 * norm.sf(abs(zI)), 'cells': n}
@@ -0,0 +1,241 @@
+"""
+***************************************************************************
+    layerio.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+from qgis.core import QgsVectorLayer, QgsFeatureSink, QgsFeatureRequest, QgsFeature, QgsFields, QgsField, QgsWkbTypes, QgsCoordinateReferenceSystem
+from PyQt5.QtCore import QVariant
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os, json, tempfile, random, string
+import processing
+
+# Columnar formats read and written with Arrow, without OGR
+PARQUET_EXTENSIONS = ('.parquet', '.geoparquet')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+
+
+def isArrowPath(path):
+    return os.path.splitext(str(path))[1].lower() in PARQUET_EXTENSIONS + FEATHER_EXTENSIONS
+
+
+def tempPath(prefix, ext):
+    randExt = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
+    return os.path.join(tempfile.gettempdir(), 'temp_{}_{}{}'.format(prefix, randExt, ext))
+
+
+def ogrReadsParquet():
+    # GDAL >= 3.5 built with Arrow
+    try:
+        from osgeo import ogr
+        return ogr.GetDriverByName('Parquet') is not None
+    except ImportError:
+        return False
+
+
+def _geometryColumn(schema):
+    # Primary geometry column from the GeoParquet metadata of an Arrow schema
+    if schema.metadata and b'geo' in schema.metadata:
+        return json.loads(schema.metadata[b'geo']).get('primary_column', 'geometry')
+    return 'geometry'
+
+
+def readFile(path, fields=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_EXTENSIONS:
+        columns = None if fields is None else list(fields) + [_geometryColumn(pq.read_schema(path))]
+        return gpd.read_parquet(path, columns=columns)
+    elif ext in FEATHER_EXTENSIONS:
+        columns = None if fields is None else list(fields) + [_geometryColumn(pa.ipc.open_file(path).schema)]
+        return gpd.read_feather(path, columns=columns)
+    data = gpd.read_file(path)
+    return data if fields is None else data[list(fields) + [data.geometry.name]]
+
+
+def layerFile(layer):
+    """File with the features of a layer that readFile reads without QGIS (e.g. in worker processes).
+
+    GeoParquet / Feather layers are their own file, other layers are cloned
+    to a GeoPackage, which keeps the full field names.
+    """
+    path = layer.source().split('|')[0]
+    if layer.providerType() == 'ogr' and isArrowPath(path) and not layer.subsetString():
+        return path
+    temp = tempPath('clone', '.gpkg')
+    processing.run("sat:clonelayer", {'INPUT':layer, 'OUTPUT':temp})
+    return temp
+
+
+def attributeFile(layer, fields):
+    """File with only the given (numeric) fields of a layer, for workers that need no geometries.
+
+    GeoParquet / Feather layers are their own file, the features of other
+    layers are written by chunks to a Feather file without geometries.
+    """
+    path = layer.source().split('|')[0]
+    if layer.providerType() == 'ogr' and isArrowPath(path) and not layer.subsetString():
+        return path
+    temp = tempPath('attributes', '.feather')
+    schema = pa.schema([(f, pa.float64()) for f in fields])
+    with pa.ipc.new_file(temp, schema) as writer:
+        for chunk in featureChunks(layer, fields, 65536):
+            writer.write_batch(pa.RecordBatch.from_arrays([pa.array(chunk[:, i]) for i in range(len(fields))], schema=schema))
+    return temp
+
+
+def readAttributes(path, fields):
+    # Only the given fields of a GeoParquet / Feather file, as a DataFrame (geometries not read)
+    if os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS:
+        return pd.read_parquet(path, columns=list(fields))
+    return pd.read_feather(path, columns=list(fields))
+
+
+def removeTemp(paths):
+    """Delete the temp files of layerFile / attributeFile / writeLayer (with the -wal / -shm files of GeoPackages); other paths are left alone."""
+    for path in paths:
+        if not path or os.path.dirname(path) != tempfile.gettempdir() or not os.path.basename(path).startswith('temp_'):
+            continue
+        for p in (path, path + '-wal', path + '-shm'):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def readLayer(layer, fields=None):
+    """GeoDataFrame of a layer, in the order of layer.getFeatures().
+
+    GeoParquet / Feather files are read directly into Arrow buffers (only
+    the given fields, if any). The clone of any other layer is removed once read.
+    """
+    path = layerFile(layer)
+    try:
+        return readFile(path, fields)
+    finally:
+        removeTemp([path])
+
+
+def featureChunks(layer, fields, chunkSize):
+    """Float arrays of the fields of chunks of at most chunkSize features (no geometries), NULL to NaN."""
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setSubsetOfAttributes(fields, layer.fields())
+    indices = [layer.fields().indexOf(f) for f in fields]
+    rows = []
+    for ftr in layer.getFeatures(request):
+        attrs = ftr.attributes()
+        rows.append([attrs[i] if isinstance(attrs[i], (int, float)) else np.nan for i in indices])
+        if len(rows) == chunkSize:
+            yield np.array(rows, dtype=float)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=float)
+
+
+def featureCentroids(layer, fields):
+    """GeoDataFrame of the fields (NULL to NaN) and the centroids of the features of a layer, in the order of layer.getFeatures().
+
+    Only the given fields and the centroid coordinates are read through QGIS,
+    so the layer is not cloned and the full geometries are not kept.
+    """
+    request = QgsFeatureRequest().setSubsetOfAttributes(fields, layer.fields())
+    indices = [layer.fields().indexOf(f) for f in fields]
+    rows = []
+    xy = []
+    for ftr in layer.getFeatures(request):
+        attrs = ftr.attributes()
+        rows.append([attrs[i] if isinstance(attrs[i], (int, float)) else np.nan for i in indices])
+        geometry = ftr.geometry()
+        if geometry is None or geometry.isEmpty():
+            xy.append((np.nan, np.nan))
+        else:
+            point = geometry.centroid().asPoint()
+            xy.append((point.x(), point.y()))
+    xy = np.array(xy, dtype=float).reshape(-1, 2)
+    crs = layer.crs().toWkt() if layer.crs().isValid() else None
+    return gpd.GeoDataFrame(pd.DataFrame(np.array(rows, dtype=float).reshape(-1, len(fields)), columns=list(fields)),
+                            geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1]), crs=crs)
+
+
+def writeFile(data, path):
+    if os.path.splitext(path)[1].lower() in FEATHER_EXTENSIONS:
+        data.to_feather(path)
+    else:
+        data.to_parquet(path)
+    return path
+
+
+def writeLayer(data, prefix):
+    # GeoParquet when QGIS can open it, otherwise GeoPackage
+    if ogrReadsParquet():
+        return writeFile(data, tempPath(prefix, '.parquet'))
+    path = tempPath(prefix, '.gpkg')
+    data.to_file(path, driver='GPKG')
+    return path
+
+
+def outputLayer(algorithm, parameters, name, context, data, crs, title, keep=False):
+    """Write a GeoDataFrame to the feature sink parameter name.
+
+    A GeoParquet / Feather destination is written directly from the
+    dataframe; other destinations are filled from a temporary layer, removed
+    after the copy unless keep (the caller then removes it with removeTemp).
+    Returns the destination id and the written file (None once removed).
+    """
+    destination = algorithm.parameterAsOutputLayer(parameters, name, context)
+    if isArrowPath(destination):
+        return destination, writeFile(data, destination)
+
+    path = writeLayer(data, title.replace(' ', '_').lower())
+    try:
+        source = QgsVectorLayer(path, title, "ogr")
+        source.setCrs(crs)
+        (sink, dest_id) = algorithm.parameterAsSink(parameters, name, context, source.fields(), source.wkbType(), source.sourceCrs())
+        for feature in source.getFeatures():
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        del source      # Closes the file before it is removed
+    except BaseException:
+        removeTemp([path])
+        raise
+    if keep:
+        return dest_id, path
+    removeTemp([path])
+    return dest_id, None
+
+
+def outputTable(algorithm, parameters, name, context, table):
+    """Write a DataFrame to the table (no geometry) sink parameter name, one feature per row.
+
+    A Parquet / Feather destination is written directly from the dataframe.
+    Returns the destination id, None if the optional sink is not set.
+    """
+    if parameters.get(name) is None:
+        return None
+    destination = algorithm.parameterAsOutputLayer(parameters, name, context)
+    if isArrowPath(destination):
+        if os.path.splitext(destination)[1].lower() in FEATHER_EXTENSIONS:
+            table.reset_index(drop=True).to_feather(destination)
+        else:
+            table.to_parquet(destination, index=False)
+        return destination
+
+    fields = QgsFields()
+    for column, dtype in table.dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype):
+            fields.append(QgsField(str(column), QVariant.LongLong))
+        elif pd.api.types.is_float_dtype(dtype):
+            fields.append(QgsField(str(column), QVariant.Double))
+        else:
+            fields.append(QgsField(str(column), QVariant.String))
+    (sink, dest_id) = algorithm.parameterAsSink(parameters, name, context, fields, QgsWkbTypes.NoGeometry, QgsCoordinateReferenceSystem())
+    if sink is None:
+        return None
+    for row in table.itertuples(index=False):
+        feature = QgsFeature(fields)
+        feature.setAttributes([None if pd.isna(v) else (v.item() if hasattr(v, 'item') else v) for v in row])
+        sink.addFeature(feature, QgsFeatureSink.FastInsert)
+    return dest_id
@@ -0,0 +1,305 @@
+"""
+***************************************************************************
+    multiscale.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from types import SimpleNamespace
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial.distance import cdist
+import spreg.user_output as USER
+from mgwr.gwr import MGWR, MGWRResults
+from mgwr.sel_bw import Sel_BW
+from mgwr.search import golden_section, multi_bw
+
+# Max number of elements in one block of kernel rows (~32MB of distances)
+CHUNK = 2 ** 22
+EPS = 1.0000001                 # As mgwr, the adaptive bandwidth is the distance to the bw-th neighbor * EPS
+MGWR_RADIUS = 6371.0            # Earth radius of the haversine distances of mgwr
+
+# Kernel settings and cached kernels of the process (the main one or a worker)
+_STATE = {}
+
+
+class _LRU(OrderedDict):
+    # Least recently used entries dropped over a memory limit (bytes)
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.used = 0
+
+    def fits(self, size):
+        return size <= self.limit
+
+    def get(self, key):
+        value = super().get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def store(self, key, value, size):
+        if not self.fits(size):
+            return
+        while self and self.used + size > self.limit:
+            self.used -= self.popitem(last=False)[1][1]
+        self[key] = (value, size)
+        self.used += size
+
+
+def initKernels(coords, kernel, fixed, spherical, cacheBytes):
+    """Kernel settings of the process, also the initializer of the workers of the pool."""
+    _STATE.update(coords=np.asarray(coords, dtype=float), kernel=kernel, fixed=fixed, spherical=spherical,
+                  kernels=_LRU(cacheBytes))
+
+
+def _distances(r0, r1):
+    coords = _STATE['coords']
+    if not _STATE['spherical']:
+        return cdist(coords[r0:r1], coords)
+    # Haversine (km), as the kernels of mgwr
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    dLat = lat[None, :] - lat[r0:r1, None]
+    dLon = lon[None, :] - lon[r0:r1, None]
+    a = np.sin(dLat / 2) ** 2 + np.cos(lat[None, :]) * np.cos(lat[r0:r1, None]) * np.sin(dLon / 2) ** 2
+    return 2 * MGWR_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def kernelBlock(r0, r1, bw):
+    """Kernel weights of the rows r0..r1-1 (dense, CSR for the bisquare kernel), as mgwr.kernels.Kernel."""
+    d = _distances(r0, r1)
+    if _STATE['fixed']:
+        h = float(bw)
+    else:
+        k = int(bw) - 1
+        h = np.partition(d, k, axis=1)[:, k:k + 1] * EPS
+    z = d / h
+    kernel = _STATE['kernel']
+    if kernel == 'gaussian':
+        return np.exp(-0.5 * z ** 2)
+    elif kernel == 'exponential':
+        return np.exp(-z)
+    w = (1 - z ** 2) ** 2
+    w[d >= h] = 0
+    return sp.csr_matrix(w)
+
+
+def _rowBlocks(n, workers):
+    # Row ranges of about 4 tasks per worker, every block within CHUNK distances
+    step = max(1, min(int(np.ceil(n / (4.0 * workers))), CHUNK // max(n, 1)))
+    return [(r0, min(r0 + step, n)) for r0 in range(0, n, step)]
+
+
+def _kernelSize(n, bw):
+    # Bytes of the kernel of a bandwidth (CSR for the adaptive bisquare kernel)
+    if _STATE['kernel'] == 'bisquare' and not _STATE['fixed']:
+        return 12 * n * int(bw)
+    return 8 * n * n
+
+
+def _kernelTask(r0, r1, bw, V=None):
+    # Kernel rows (V is None) or their products with V
+    block = kernelBlock(r0, r1, bw)
+    return block if V is None else block @ V
+
+
+def cachedKernel(bw):
+    """Kernel of the bandwidth from the cache of the process, built in place if it fits the cache, else None."""
+    kernels = _STATE['kernels']
+    K = kernels.get(float(bw))
+    if K is not None:
+        return K[0]
+    n = _STATE['coords'].shape[0]
+    size = _kernelSize(n, bw)
+    if not kernels.fits(size):
+        return None
+    blocks = [kernelBlock(r0, r1, bw) for r0, r1 in _rowBlocks(n, 1)]
+    K = sp.vstack(blocks).tocsr() if sp.issparse(blocks[0]) else np.vstack(blocks)
+    kernels.store(float(bw), K, size)
+    return K
+
+
+class KernelProducts:
+    """Products of the GWR kernels with the data, for the bandwidth searches of MGWR.
+
+    Every fit at a bandwidth needs the kernel weighted cross products of the
+    covariates (X'W_iX, which do not depend on y) and of the covariates with y
+    (X'W_iy). The kernel of a bandwidth is kept in an LRU cache when it fits,
+    so the bandwidths visited again by the golden section searches of later
+    backfitting iterations are one (sparse) product. The kernels that do not
+    fit are computed by row blocks in the process pool, and the y independent
+    part of every fit is cached per covariates and bandwidth (unless cacheFits
+    is False, for covariates that are never fitted again, e.g. permuted ones).
+    """
+
+    def __init__(self, n, pool=None, workers=1, cacheFits=True):
+        self.n = n
+        self.pool = pool
+        self.workers = workers
+        self.fits = _LRU(_STATE['kernels'].limit if cacheFits else 0)
+        self.evaluations = 0
+
+    def product(self, bw, V):
+        if bw == np.inf:
+            return np.broadcast_to(V.sum(axis=0), V.shape).copy()
+        kernels = _STATE['kernels']
+        K = kernels.get(float(bw))
+        if K is not None:
+            return K[0] @ V
+        blocks = _rowBlocks(self.n, self.workers)
+        size = _kernelSize(self.n, bw)
+        cache = kernels.fits(size)
+        if self.pool is None:
+            if cache:
+                return cachedKernel(bw) @ V
+            return np.vstack([_kernelTask(r0, r1, bw, V) for r0, r1 in blocks])
+        parts = list(self.pool.map(_kernelTask, *zip(*blocks), [bw] * len(blocks), [None if cache else V] * len(blocks)))
+        if not cache:
+            return np.vstack(parts)
+        K = sp.vstack(parts).tocsr() if sp.issparse(parts[0]) else np.vstack(parts)
+        kernels.store(float(bw), K, size)
+        return K @ V
+
+    def fit(self, y, X, bw):
+        """Gaussian GWR without constant (add a column of ones to X for one), the diagnostics of a lite mgwr fit."""
+        self.evaluations += 1
+        y = np.asarray(y, dtype=float).reshape(-1)
+        n, k = X.shape
+        XY = X * y[:, None]
+        key = (hashlib.sha1(np.ascontiguousarray(X).tobytes()).hexdigest(), float(bw))
+        stored = self.fits.get(key)
+        if stored is None:
+            a, b = np.triu_indices(k)
+            prod = self.product(bw, np.hstack([X[:, a] * X[:, b], XY]))
+            XtWX = np.empty((n, k, k))
+            XtWX[:, a, b] = prod[:, :len(a)]
+            XtWX[:, b, a] = prod[:, :len(a)]
+            M = np.linalg.inv(XtWX)
+            influ = np.einsum('na,nab,nb->n', X, M, X)     # Hat diagonal, the own weight is 1 for all the kernels
+            self.fits.store(key, (M, influ), M.nbytes + influ.nbytes)
+            XWy = prod[:, len(a):]
+        else:
+            M, influ = stored[0]
+            XWy = self.product(bw, XY)
+        params = np.einsum('nab,nb->na', M, XWy)
+        predy = (X * params).sum(axis=1)
+        resid = y - predy
+        return SimpleNamespace(params=params, predy=predy.reshape(-1, 1), resid_response=resid.reshape(-1, 1),
+                               tr_S=influ.sum(), resid_ss=float(resid @ resid), n=n)
+
+    def aicc(self, y, X, bw):
+        # AICc of the Gaussian family of mgwr
+        res = self.fit(y, X, bw)
+        n, trS = res.n, res.tr_S
+        llf = -np.log(res.resid_ss) * n / 2.0 - (1 + np.log(np.pi / (n / 2.0))) * n / 2.0
+        return -2.0 * llf + 2.0 * n * (trS + 1.0) / (n - trS - 2.0)
+
+
+class PooledSel_BW(Sel_BW):
+    """Sel_BW with the (multi) bandwidth searches evaluated by KernelProducts.
+
+    Golden section / AICc searches use the cached and pooled fits, the other
+    search methods and criteria fall back to mgwr.
+    """
+
+    def __init__(self, coords, y, X_loc, products, feedback=None, **kwargs):
+        Sel_BW.__init__(self, coords, y, X_loc, **kwargs)
+        self.products = products
+        self.feedback = feedback
+
+    def _supported(self):
+        return self.search_method == 'golden_section' and self.criterion == 'AICc'
+
+    def _bw(self):
+        if not self._supported():
+            return Sel_BW._bw(self)
+        X = np.hstack([np.ones((len(self.y), 1)), self.X_loc]) if self.constant else self.X_loc
+        gwr_func = lambda bw: self.products.aicc(self.y, X, bw)
+        self._optimized_function = gwr_func
+        a, c = self._init_section(self.X_glob, self.X_loc, self.coords, self.constant)
+        delta = 0.38197  # 1 - (np.sqrt(5.0)-1.0)/2.0
+        self.bw = golden_section(a, c, delta, gwr_func, self.tol, self.max_iter, self.bw_max, self.int_score, self.verbose)
+
+    def _mbw(self):
+        if not self._supported():
+            return Sel_BW._mbw(self)
+        X = USER.check_constant(self.X_loc)[0] if self.constant else self.X_loc
+        n, k = X.shape
+        calls = [0]
+
+        def gwr_func(y, X, bw):
+            return self.products.fit(y, X, bw)
+
+        def bw_func(y, X):
+            return PooledSel_BW(self.coords, y, X, self.products, X_glob=[], family=self.family, kernel=self.kernel,
+                                fixed=self.fixed, offset=self.offset, constant=False, spherical=self.spherical)
+
+        def sel_func(selector, bw_min=None, bw_max=None):
+            bw = selector.search(search_method=self.search_method, criterion=self.criterion, bw_min=bw_min, bw_max=bw_max,
+                                 interval=self.interval, tol=self.tol, max_iter=self.max_iter, verbose=False)
+            if self.feedback is not None and calls[0] > 0:
+                self.feedback.pushInfo('Backfitting iteration {}, covariate {}: bandwidth {}'.format((calls[0] - 1) // k + 1, (calls[0] - 1) % k, bw))
+            calls[0] += 1
+            return bw
+
+        self.bw = multi_bw(self.init_multi, self.y, X, n, k, self.family, self.tol_multi, self.max_iter_multi,
+                           self.rss_score, gwr_func, bw_func, sel_func, self.multi_bw_min, self.multi_bw_max,
+                           self.bws_same_times, verbose=self.verbose)
+
+
+class PooledMGWR(MGWR):
+    """MGWR with the chunked inference of mgwr run in the process pool.
+
+    Every chunk replays the backfitting history, so the kernel of a bandwidth
+    is needed once per iteration; in the workers it comes from the kernel
+    cache of the process instead of being rebuilt row by row.
+    """
+
+    def __getstate__(self):
+        # The selector holds the pool, the workers only need the data and the bandwidths
+        state = self.__dict__.copy()
+        state['selector'] = None
+        return state
+
+    def _build_wi(self, i, bw):
+        if bw == np.inf or not _STATE:
+            return MGWR._build_wi(self, i, bw)
+        K = cachedKernel(bw)
+        if K is None:
+            return MGWR._build_wi(self, i, bw)
+        return K[i].toarray().ravel() if sp.issparse(K) else K[i]
+
+    def fit(self, n_chunks=1, pool=None, workers=1, feedback=None):
+        params = self.selector.params
+        predy = np.sum(self.X * params, axis=1).reshape(-1, 1)
+        self.n_chunks = max(1, workers * n_chunks)
+        chunks = range(self.n_chunks)
+        if pool is None:
+            rslt = []
+            for i in chunks:
+                rslt.append(self._chunk_compute_R(i))
+                if feedback is not None:
+                    feedback.setProgress(50 + 50 * (i + 1) / self.n_chunks)
+        else:
+            futures = {pool.submit(_inferenceChunk, self, i): i for i in chunks}
+            rslt = [None] * self.n_chunks
+            for done, future in enumerate(as_completed(futures)):
+                rslt[futures[future]] = future.result()
+                if feedback is not None:
+                    feedback.setProgress(50 + 50 * (done + 1) / self.n_chunks)
+
+        rslt_list = list(zip(*rslt))
+        ENP_j = np.sum(np.array(rslt_list[0]), axis=0)
+        CCT = np.sum(np.array(rslt_list[1]), axis=0)
+        return MGWRResults(self, params, predy, CCT, ENP_j, np.ones(self.n), None, self.name_x)
+
+
+def _inferenceChunk(model, chunk):
+    return model._chunk_compute_R(chunk)
@@ -0,0 +1,33 @@
+"""
+***************************************************************************
+    parallel.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import multiprocessing, os, sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def workerCount(workers):
+    # 0 = all the cores
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+
+def processContext():
+    # Inside QGIS sys.executable is the QGIS application (Windows/Mac), so the
+    # spawned workers have to be started with the python interpreter of QGIS
+    context = multiprocessing.get_context('spawn')
+    for name in ('pythonw.exe', 'python.exe', os.path.join('bin', 'python3'), os.path.join('bin', 'python')):
+        python = os.path.join(sys.exec_prefix, name)
+        if os.path.exists(python):
+            context.set_executable(python)
+            break
+    return context
+
+
+def processPool(workers, initializer=None, initargs=()):
+    return ProcessPoolExecutor(max_workers=workerCount(workers), mp_context=processContext(), initializer=initializer, initargs=initargs)
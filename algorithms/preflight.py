@@ -0,0 +1,163 @@
+"""
+***************************************************************************
+    preflight.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import math, os, sys, time
+
+# Rough costs, calibrated on libpysal / esda / mgwr (one core for weights, all cores for GWR)
+BYTES_PER_PAIR_W = 160          # libpysal W: dicts of neighbor and weight lists
+BYTES_PER_PAIR_SPARSE = 24      # CSR matrix (+ coo while building)
+BYTES_PER_FEATURE = 2000        # Geometries, dataframe and copies
+SECONDS_PER_PAIR_W = 2e-6
+SECONDS_PER_CONTIGUITY = 1e-4   # Per feature, spatial index queries
+SECONDS_PER_DRAW = 5e-9         # One permuted value
+SECONDS_PER_GWR = 4e-8          # Per pair of features and per variable, one fit
+GWR_BANDWIDTH_FITS = 12         # Golden section search, relative to one fit
+SECONDS_PER_CELL = 2e-7         # Raster Moran, both passes and the LISA output
+ARRAYS_PER_BLOCK = 12           # Raster Moran, float arrays of one block alive at once
+BUDGET_SHARE = 0.8              # Share of the available memory used by default
+
+
+def availableMemory():
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def memoryBudget(budgetMB):
+    # Budget in bytes, 0 = share of the available memory, None if unknown
+    if budgetMB > 0:
+        return budgetMB * 1024 * 1024
+    available = availableMemory()
+    return None if available is None else BUDGET_SHARE * available
+
+
+def extentArea(extent, geographic=False):
+    """Area of a QgsRectangle, in km2 for geographic layers (distance thresholds in km)."""
+    if not geographic:
+        return extent.area()
+    lon = math.radians(extent.xMaximum() - extent.xMinimum())
+    lat0, lat1 = math.radians(max(extent.yMinimum(), -90.0)), math.radians(min(extent.yMaximum(), 90.0))
+    return 6371.0088 ** 2 * lon * (math.sin(lat1) - math.sin(lat0))
+
+
+def neighborPairs(n, method, knn_dist, area):
+    """Expected number of neighbor pairs for the weights methods (Queen = 0, Rook = 1, KNN = 2, Distance = 3)."""
+    if method == 0:
+        return 6 * n
+    elif method == 1:
+        return 4 * n
+    elif method == 2:
+        return int(knn_dist) * n
+    # Distance band: uniform density over the extent
+    density = n / area if area > 0 else n
+    return n * min(n - 1, density * math.pi * knn_dist ** 2)
+
+
+def estimateWeights(n, method, knn_dist, area, sparse=False):
+    # (bytes, seconds) of the spatial weights
+    pairs = neighborPairs(n, method, knn_dist, area)
+    memory = n * BYTES_PER_FEATURE + pairs * (BYTES_PER_PAIR_SPARSE if sparse else BYTES_PER_PAIR_W)
+    seconds = pairs * SECONDS_PER_PAIR_W
+    if method == 0 or method == 1:
+        seconds += n * SECONDS_PER_CONTIGUITY
+    return memory, seconds
+
+
+def estimateMoran(n, method, knn_dist, area, permutations=999, sparse=False):
+    memory, seconds = estimateWeights(n, method, knn_dist, area, sparse)
+    if sparse:
+        # Permutations in blocks of at most 2**22 values, with their lags
+        memory += 3 * 8 * min(n * permutations, 2 ** 22)
+    return memory, seconds + n * permutations * SECONDS_PER_DRAW
+
+
+def estimateLocalMoran(n, method, knn_dist, area, permutations=999, sparse=False):
+    memory, seconds = estimateWeights(n, method, knn_dist, area, sparse)
+    if sparse:
+        memory += 4 * 8 * 2 ** 22
+    else:
+        # esda keeps the permuted statistics of every feature
+        memory += 8 * n * permutations
+    k = max(neighborPairs(n, method, knn_dist, area) / max(n, 1), 1)
+    return memory, seconds + n * permutations * k * SECONDS_PER_DRAW
+
+
+def estimateGWR(n, k, autoBandwidth, workers=None):
+    """(bytes, seconds) of a GWR fit with n features and k variables (constant included)."""
+    workers = workers or os.cpu_count() or 1
+    memory = n * BYTES_PER_FEATURE + 8 * n * k * 12 + 8 * n * 6 * workers + 600 * n
+    seconds = SECONDS_PER_GWR * k * n * n
+    if autoBandwidth:
+        seconds *= 1 + GWR_BANDWIDTH_FITS
+    return memory, seconds
+
+
+def estimateRasterMoran(cells, cols, rowsPerBlock):
+    # (bytes, seconds), the memory is bounded by one block of rows (plus the halo) whatever the raster size
+    return ARRAYS_PER_BLOCK * 8 * cols * (rowsPerBlock + 4), cells * SECONDS_PER_CELL
+
+
+def formatBytes(b):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if b < 1024:
+            return '{:.1f} {}'.format(b, unit)
+        b /= 1024.0
+    return '{:.1f} TB'.format(b)
+
+
+def formatSeconds(s):
+    if s < 60:
+        return '{:.1f} s'.format(s)
+    elif s < 3600:
+        return '{:.1f} min'.format(s / 60)
+    return '{:.1f} h'.format(s / 3600)
+
+
+def peakMemory():
+    # Peak resident memory of the process in bytes (None on Windows without psutil)
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except ImportError:
+        return None
+
+
+def describe(estimate):
+    return 'memory {}, runtime {}'.format(formatBytes(estimate[0]), formatSeconds(estimate[1]))
+
+
+def start():
+    return time.perf_counter(), peakMemory()
+
+
+def compare(estimate, started):
+    """Estimate versus actual, for the log. started is the value of start() before the run.
+
+    The actual memory is the growth of the peak of the process, so it is 0
+    when the run stayed below an earlier peak.
+    """
+    t0, peak0 = started
+    elapsed = time.perf_counter() - t0
+    peak = peakMemory()
+    actual = 'unknown' if peak is None or peak0 is None else formatBytes(max(peak - peak0, 0))
+    return 'Pre-flight estimate: {}; actual: peak memory growth {}, runtime {}'.format(describe(estimate), actual, formatSeconds(elapsed))
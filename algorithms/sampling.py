@@ -0,0 +1,108 @@
+"""
+***************************************************************************
+    sampling.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import time, warnings
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.stats import t as student
+from .weights import pointCoordinates, neighborCoordinates, searchRadius, binaryMatrix, knnPairs, distancePairs, contiguityPairs
+
+
+def stratifiedSample(coords, size, rng):
+    """Sample of rows spread over a grid of cells, proportional to the features of every cell."""
+    n = coords.shape[0]
+    cells = max(1, int(np.sqrt(size / 10.0)))
+    mins, maxs = coords.min(axis=0), coords.max(axis=0)
+    span = np.where(maxs > mins, maxs - mins, 1.0)
+    ij = np.minimum((cells * (coords - mins) / span).astype(int), cells - 1)
+    cell = ij[:, 0] * cells + ij[:, 1]
+
+    # Random order, then the first rows of every cell up to its share
+    order = rng.permutation(n)
+    cell = cell[order]
+    counts = np.bincount(cell, minlength=cells * cells)
+    share = np.floor(counts * size / n).astype(int)
+    # Largest remainders get the rows left
+    left = size - share.sum()
+    if left > 0:
+        share[np.argsort(-(counts * size / n - share))[:left]] += 1
+    sortedIdx = np.argsort(cell, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.empty(n, dtype=int)
+    rank[sortedIdx] = np.arange(n) - np.repeat(starts, counts)
+    return np.sort(order[rank < share[cell]])
+
+
+def _lagRows(data, coords, tree, rows, method, knn_dist):
+    # Binary weights of the sampled rows to all the features (neighbors from the whole layer)
+    n = data.shape[0]
+    if method == 0 or method == 1:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')       # Islands / components of the sampled subsets
+            r, c = contiguityPairs(data, rows, method)
+    elif method == 2:
+        r, c = knnPairs(coords, tree, rows, int(knn_dist))
+    else:
+        r, c = distancePairs(coords, tree, rows, searchRadius(data, knn_dist))
+    keep = np.isin(r, rows)
+    return binaryMatrix(r[keep], c[keep], n)[rows]
+
+
+def sampledMoran(data, y, method, knn_dist, sampleSize, draws=30, stratified=False, timeBudget=0, confidence=0.95, seed=None, started=None):
+    """Approximate Moran's I (row standardized weights) from samples of focal features.
+
+    The standardization and the neighbors use the whole layer, only the sum
+    of z_i * lag_i and the number of weights are estimated from the sampled
+    features, so every draw is a ratio estimate of the exact statistic. At
+    most draws samples are drawn, fewer if the time budget (seconds, 0 = none)
+    runs out. The budget and the elapsed time count from started (a
+    time.perf_counter() value, e.g. before reading the layer; default now).
+    Returns the mean estimate, its confidence interval and the details of the run.
+    """
+    if started is None:
+        started = time.perf_counter()
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    z = y - y.mean()
+    ss = (z * z).sum()
+    sampleSize = int(min(max(sampleSize, 2), n))
+    rng = np.random.default_rng(seed)
+
+    tree = None
+    coords = None
+    if method == 2 or method == 3:
+        coords = neighborCoordinates(data)
+        tree = cKDTree(coords)
+    planar = pointCoordinates(data) if stratified else None
+
+    estimates = []
+    for draw in range(max(draws, 2)):
+        if stratified:
+            rows = stratifiedSample(planar, sampleSize, rng)
+        else:
+            rows = np.sort(rng.choice(n, sampleSize, replace=False))
+        W = _lagRows(data, coords, tree, rows, method, knn_dist)
+        rowSums = np.asarray(W.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lag = np.where(rowSums > 0, (W @ z) / rowSums, 0.0)
+        weighted = (rowSums > 0).sum()
+        if weighted > 0:
+            estimates.append(n * (z[rows] * lag).sum() / (weighted * ss))
+        if timeBudget > 0 and time.perf_counter() - started > timeBudget and len(estimates) >= 2:
+            break
+
+    if len(estimates) < 2:
+        raise ValueError('Too few sampled features with neighbors')
+    estimates = np.array(estimates)
+    mean = estimates.mean()
+    half = student.ppf(0.5 + confidence / 2, len(estimates) - 1) * estimates.std(ddof=1) / np.sqrt(len(estimates))
+    return {'estimate': mean, 'low': mean - half, 'high': mean + half, 'expected': -1.0 / (n - 1),
+            'draws': len(estimates), 'sampleSize': sampleSize, 'elapsed': time.perf_counter() - started,
+            'estimates': estimates}
@@ -0,0 +1,95 @@
+"""
+***************************************************************************
+    selection.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import itertools, math
+import numpy as np
+import pandas as pd
+from .multiscale import initKernels, KernelProducts, PooledSel_BW
+
+# Data of the process (the main one or a worker), the same for all the candidate models
+_DATA = {}
+
+
+def initSelection(coords, X, y, kernel, fixed, constant, spherical, cacheBytes):
+    """Candidate pool and kernel settings of the process, also the initializer of the workers of the pool.
+
+    The kernels are cached per bandwidth, so the distances and kernels of a
+    bandwidth are computed once per process and reused by every candidate
+    model that visits it.
+    """
+    initKernels(coords, kernel, fixed, spherical, cacheBytes)
+    _DATA.update(coords=coords, X=X, y=y, kernel=kernel, fixed=fixed, constant=constant, spherical=spherical,
+                 products=KernelProducts(coords.shape[0]))
+
+
+def candidateAICc(columns, bw=0):
+    """(columns, bandwidth, AICc) of the GWR with the given columns of the pool, bw = 0 for the golden section search."""
+    X = _DATA['X'][:, list(columns)]
+    products = _DATA['products']
+    if bw == 0:
+        selector = PooledSel_BW(_DATA['coords'], _DATA['y'], X, products, kernel=_DATA['kernel'], fixed=_DATA['fixed'],
+                                constant=_DATA['constant'], spherical=_DATA['spherical'])
+        bw = selector.search()
+        score = selector.bw[1]
+    else:
+        if _DATA['constant']:
+            X = np.hstack([np.ones((X.shape[0], 1)), X])
+        score = products.aicc(_DATA['y'], X, bw)
+    return tuple(columns), float(bw), float(score)
+
+
+def _evaluate(candidates, bw, pool):
+    if pool is None:
+        return [candidateAICc(c, bw) for c in candidates]
+    return list(pool.map(candidateAICc, candidates, [bw] * len(candidates)))
+
+
+def forwardSelection(k, maxVars, bw=0, pool=None, feedback=None):
+    """Forward stepwise selection: the variable that lowers the AICc most is added, until none does."""
+    evaluated = []
+    selected = []
+    best = np.inf
+    while len(selected) < maxVars:
+        candidates = [tuple(selected + [j]) for j in range(k) if j not in selected]
+        scores = _evaluate(candidates, bw, pool)
+        evaluated += scores
+        step = min(scores, key=lambda s: s[2])
+        if feedback is not None:
+            feedback.pushInfo('Step {}: {} models, best AICc {}'.format(len(selected) + 1, len(candidates), round(step[2], 3)))
+            if feedback.isCanceled():
+                break
+        if step[2] >= best:
+            break
+        best = step[2]
+        selected = list(step[0])
+    return evaluated
+
+
+def subsetCount(k, maxVars):
+    # Number of models of the exhaustive search
+    return sum(math.comb(k, size) for size in range(1, maxVars + 1))
+
+
+def exhaustiveSelection(k, maxVars, bw=0, pool=None, feedback=None):
+    """All the subsets of 1 to maxVars variables."""
+    candidates = [c for size in range(1, maxVars + 1) for c in itertools.combinations(range(k), size)]
+    if feedback is not None:
+        feedback.pushInfo('{} candidate models'.format(len(candidates)))
+    return _evaluate(candidates, bw, pool)
+
+
+def rankModels(evaluated, names):
+    """Table of the models, lowest AICc first, with the difference to the best one."""
+    table = pd.DataFrame([{'Variables': ', '.join(names[j] for j in columns), 'Count': len(columns), 'Bandwidth': bw, 'AICc': score}
+                          for columns, bw, score in evaluated])
+    table = table.drop_duplicates(subset='Variables').sort_values('AICc').reset_index(drop=True)
+    table['dAICc'] = table['AICc'] - table['AICc'].iloc[0]
+    table.index += 1
+    return table
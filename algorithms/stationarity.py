@@ -0,0 +1,95 @@
+"""
+***************************************************************************
+    stationarity.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+from scipy.stats import beta
+from .multiscale import initKernels, KernelProducts, PooledSel_BW
+
+# Data of the process (the main one or a worker)
+_DATA = {}
+
+
+def initStationarity(coords, XPath, yPath, kernel, fixed, constant, spherical, cacheBytes):
+    """Kernel settings and the X / y arrays of the process, also the initializer of the workers of the pool.
+
+    X and y are memory mapped read-only from .npy files, so all the workers
+    share the pages of one copy instead of receiving the arrays with every task.
+    Every permutation fits different covariates, so only the kernels are cached.
+    """
+    initKernels(coords, kernel, fixed, spherical, cacheBytes)
+    _DATA.update(coords=coords, X=np.load(XPath, mmap_mode='r'), y=np.load(yPath, mmap_mode='r'), kernel=kernel,
+                 fixed=fixed, constant=constant, spherical=spherical, products=KernelProducts(coords.shape[0], cacheFits=False))
+
+
+def permutationSDs(seeds, bw=0):
+    """Standard deviations of the coefficients of the GWR refitted once per seed with permuted coordinates.
+
+    Moving the observations to permuted locations is the same as permuting the
+    rows of X and y at the original locations, so the kernels of the process
+    (cached per bandwidth) serve every permutation. bw = 0 searches the
+    bandwidth of every permutation, as the test of mgwr.
+    """
+    X, y, products = _DATA['X'], _DATA['y'], _DATA['products']
+    n = X.shape[0]
+    sds = []
+    for seed in seeds:
+        order = np.random.default_rng(seed).permutation(n)
+        Xp, yp = np.asarray(X[order]), np.asarray(y[order])
+        b = bw
+        if bw == 0:
+            b = PooledSel_BW(_DATA['coords'], yp, Xp, products, kernel=_DATA['kernel'], fixed=_DATA['fixed'],
+                             constant=_DATA['constant'], spherical=_DATA['spherical']).search()
+        if _DATA['constant']:
+            Xp = np.hstack([np.ones((n, 1)), Xp])
+        sds.append(products.fit(yp, Xp, b).params.std(axis=0))
+    return np.array(sds)
+
+
+def settled(exceed, draws, alpha=0.05, confidence=0.99):
+    """True for the covariates whose Clopper-Pearson interval of the p-value lies entirely on one side of alpha."""
+    tail = (1 - confidence) / 2
+    low = np.where(exceed > 0, beta.ppf(tail, np.maximum(exceed, 1), draws - exceed + 1), 0.0)
+    high = np.where(exceed < draws, beta.ppf(1 - tail, exceed + 1, np.maximum(draws - exceed, 1)), 1.0)
+    return (high < alpha) | (low > alpha)
+
+
+def stationarityTest(observed, permutations=999, bw=0, pool=None, workers=1, alpha=0.05, seed=None, feedback=None):
+    """Monte Carlo test of spatial variability of every coefficient surface.
+
+    observed holds the standard deviations of the fitted coefficients. The
+    permutations run in rounds of one task per worker, and the test stops once
+    every p-value is settled with respect to alpha (or after all the
+    permutations). Returns the pseudo p-values (e + 1) / (m + 1), with e the
+    permutations with a larger standard deviation, the number of permutations
+    m and whether the test stopped early.
+    """
+    observed = np.asarray(observed, dtype=float)
+    seeds = np.random.default_rng(seed).integers(2 ** 32, size=permutations)
+    batch = int(max(1, min(25, np.ceil(permutations / (4.0 * workers)))))
+    exceed = np.zeros(observed.shape[0])
+    draws = 0
+    start = 0
+    while start < permutations:
+        tasks = [seeds[s:min(s + batch, permutations)] for s in range(start, min(start + batch * workers, permutations), batch)]
+        start += sum(len(t) for t in tasks)
+        if pool is None:
+            results = [permutationSDs(t, bw) for t in tasks]
+        else:
+            results = list(pool.map(permutationSDs, tasks, [bw] * len(tasks)))
+        sds = np.vstack(results)
+        exceed += (sds > observed).sum(axis=0)
+        draws += sds.shape[0]
+        if feedback is not None:
+            feedback.setProgress(100 * draws / permutations)
+            if feedback.isCanceled():
+                break
+        if settled(exceed, draws, alpha).all():
+            break
+    return {'p': (exceed + 1) / (draws + 1), 'permutations': draws, 'early': draws < permutations}
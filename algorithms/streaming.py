@@ -0,0 +1,149 @@
+"""
+***************************************************************************
+    streaming.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from .layerio import PARQUET_EXTENSIONS
+import os
+
+
+class CoMoments:
+    """Pairwise complete means, co-moments and counts of k variables, accumulated by chunks of rows.
+
+    For every pair (i, j) only the rows where both values are present count,
+    as in DataFrame.corr: n[i, j] is the number of such rows, mean[i, j] the
+    mean of variable i over them, m2[i, j] the sum of squared deviations of
+    variable i over them and c[i, j] the co-moment of i and j. Chunks are
+    merged with the pairwise update of Chan et al., so the results do not
+    depend on the chunking and the memory is O(k^2) for any number of rows.
+    """
+
+    def __init__(self, k):
+        self.rows = 0
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.c = np.zeros((k, k))
+
+    def update(self, X):
+        """Add a chunk of rows (NaN = missing)."""
+        X = np.asarray(X, dtype=float)
+        if X.shape[0] == 0:
+            return self
+        valid = np.isfinite(X)
+        mask = valid.astype(float)
+        # Shifted by the chunk means, so the sums of products within the chunk do not lose precision
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = np.where(valid, X, 0.0).sum(axis=0) / valid.sum(axis=0)
+        shift = np.where(np.isfinite(shift), shift, 0.0)
+        Z = np.where(valid, X - shift, 0.0)
+        chunk = CoMoments(X.shape[1])
+        chunk.rows = X.shape[0]
+        chunk.n = mask.T @ mask
+        sums = Z.T @ mask                     # [i, j]: sum of Z_i over the rows with i and j
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(chunk.n > 0, sums / chunk.n, 0.0)
+        chunk.mean = means + shift[:, None]
+        chunk.m2 = (Z ** 2).T @ mask - sums * means
+        chunk.c = Z.T @ Z - sums * means.T
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Add the moments of other (e.g. of another chunk reader)."""
+        n = self.n + other.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(n > 0, other.n / n, 0.0)
+        delta = other.mean - self.mean
+        weight = self.n * share               # na * nb / n
+        self.c = self.c + other.c + weight * delta * delta.T
+        self.m2 = self.m2 + other.m2 + weight * delta ** 2
+        self.mean = self.mean + delta * share
+        self.n = n
+        self.rows += other.rows
+        return self
+
+    def correlation(self):
+        # Pearson correlations, NaN for pairs with less than 2 rows or no variance
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = self.c / np.sqrt(self.m2 * self.m2.T)
+        r[self.n < 2] = np.nan
+        return np.clip(r, -1.0, 1.0)
+
+    def missing(self):
+        # Missing values per variable
+        return self.rows - np.diag(self.n).astype(int)
+
+
+def arrayChunk(batch, fields):
+    # Record batch to a float array, nulls to NaN
+    return np.column_stack([pc.cast(batch.column(f), pa.float64()).to_numpy(zero_copy_only=False) for f in fields])
+
+
+def fileParts(path):
+    # Row groups (GeoParquet) or record batches (Feather), the units shared by the chunk readers
+    if os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS:
+        return pq.ParquetFile(path).num_row_groups
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).num_record_batches
+
+
+def fileMoments(path, fields, parts, chunkSize):
+    """CoMoments of the fields over the given row groups / record batches of a GeoParquet / Feather file.
+
+    Runs in the chunk readers: only the fields are read, one chunk of at most
+    chunkSize rows at a time.
+    """
+    moments = CoMoments(len(fields))
+    if os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunkSize, row_groups=list(parts), columns=list(fields)):
+            moments.update(arrayChunk(batch, fields))
+        return moments
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for part in parts:
+            batch = reader.get_batch(part).select(list(fields))
+            for start in range(0, batch.num_rows, chunkSize):
+                moments.update(arrayChunk(batch.slice(start, chunkSize), fields))
+    return moments
+
+
+def streamFile(path, fields, chunkSize, pool=None, workers=1, feedback=None):
+    """CoMoments of the fields of a GeoParquet / Feather file, the parts split among the chunk readers of the pool."""
+    parts = fileParts(path)
+    if pool is None or parts < 2:
+        tasks = [[p] for p in range(parts)]
+        results = (fileMoments(path, fields, t, chunkSize) for t in tasks)
+    else:
+        # A few tasks per reader, so readers of larger parts do not hold up the others
+        tasks = [list(t) for t in np.array_split(np.arange(parts), min(parts, 4 * workers)) if len(t)]
+        results = pool.map(fileMoments, [path] * len(tasks), [fields] * len(tasks), tasks, [chunkSize] * len(tasks))
+    moments = CoMoments(len(fields))
+    for done, result in enumerate(results):
+        moments.merge(result)
+        if feedback is not None:
+            feedback.setProgress(100 * (done + 1) / len(tasks))
+            if feedback.isCanceled():
+                break
+    return moments
+
+
+def streamChunks(chunks, k, feedback=None, total=None):
+    """CoMoments of an iterable of row chunks (e.g. the features of a layer), k variables."""
+    moments = CoMoments(k)
+    for chunk in chunks:
+        moments.update(chunk)
+        if feedback is not None:
+            if total:
+                feedback.setProgress(100 * moments.rows / total)
+            if feedback.isCanceled():
+                break
+    return moments
@@ -0,0 +1,146 @@
+"""
+***************************************************************************
+    tiling.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+import geopandas as gpd
+import pandas as pd
+from scipy.spatial import cKDTree
+from .weights import isGeographic, pointCoordinates, neighborCoordinates, sparseWeights, EARTH_RADIUS
+from .lisa import paddedWeights, permutationInference, localMoranDeviations, quadrants
+
+ID_FIELD = 'SAT_ID'
+
+
+def tileBounds(extent, tiles):
+    # tiles x tiles grid over (xmin, ymin, xmax, ymax), with flags for the last column / row
+    xmin, ymin, xmax, ymax = extent
+    xs = np.linspace(xmin, xmax, tiles + 1)
+    ys = np.linspace(ymin, ymax, tiles + 1)
+    return [((xs[i], ys[j], xs[i+1], ys[j+1]), i == tiles - 1, j == tiles - 1) for i in range(tiles) for j in range(tiles)]
+
+
+def _inTile(coords, bounds, lastX, lastY):
+    x0, y0, x1, y1 = bounds
+    inX = (coords[:, 0] >= x0) & ((coords[:, 0] <= x1) if lastX else (coords[:, 0] < x1))
+    inY = (coords[:, 1] >= y0) & ((coords[:, 1] <= y1) if lastY else (coords[:, 1] < y1))
+    return inX & inY
+
+
+def _expand(bounds, h, geographic=False):
+    # h in degrees of latitude for geographic layers, longitude grows towards the poles
+    hx = h
+    if geographic:
+        lat = min(max(abs(bounds[1]), abs(bounds[3])) + h, 90.0)
+        hx = min(h / max(np.cos(np.radians(lat)), 1e-6), 360.0)
+    return (bounds[0] - hx, bounds[1] - h, bounds[2] + hx, bounds[3] + h)
+
+
+def _edgeDistance(coords, box, geographic):
+    # Shortest distance from the points to the edges of the box (degrees of arc for geographic layers)
+    dx = np.minimum(coords[:, 0] - box[0], box[2] - coords[:, 0])
+    dy = np.minimum(coords[:, 1] - box[1], box[3] - coords[:, 1])
+    if geographic:
+        lat = min(max(abs(box[1]), abs(box[3])), 90.0)
+        dx = dx * np.cos(np.radians(lat))
+    return np.minimum(dx, dy)
+
+
+def _readBox(path, box, geographic):
+    # Features in the box, wrapped around the antimeridian for geographic layers
+    if not geographic or (box[0] >= -180 and box[2] <= 180):
+        return gpd.read_file(path, bbox=box)
+    if box[2] - box[0] >= 360:
+        return gpd.read_file(path, bbox=(-180, box[1], 180, box[3]))
+    parts = [gpd.read_file(path, bbox=(max(box[0], -180), box[1], min(box[2], 180), box[3]))]
+    if box[0] < -180:
+        parts.append(gpd.read_file(path, bbox=(box[0] + 360, box[1], 180, box[3])))
+    if box[2] > 180:
+        parts.append(gpd.read_file(path, bbox=(-180, box[1], box[2] - 360, box[3])))
+    return pd.concat(parts).drop_duplicates(subset=ID_FIELD)
+
+
+def _haloData(path, core, coreCoords, method, knn_dist, extent):
+    # The tile features plus every feature that can be a neighbor of them
+    if method == 0 or method == 1:
+        return gpd.read_file(path, bbox=tuple(core.total_bounds))
+    geographic = isGeographic(core)
+    bounds = (coreCoords[:, 0].min(), coreCoords[:, 1].min(), coreCoords[:, 0].max(), coreCoords[:, 1].max())
+    if method == 3:
+        h = np.degrees(knn_dist / EARTH_RADIUS) if geographic else knn_dist
+        return _readBox(path, _expand(bounds, h, geographic), geographic)
+
+    # KNN: grow the halo until the k-th neighbor of every tile feature is closer than the halo edge
+    k = int(knn_dist)
+    area = max((bounds[2] - bounds[0]) * (bounds[3] - bounds[1]), 1e-12)
+    h = 2 * np.sqrt(area * (k + 1) / max(len(core), 1))
+    while True:
+        box = _expand(bounds, h, geographic)
+        halo = _readBox(path, box, geographic)
+        covers = box[0] <= extent[0] and box[1] <= extent[1] and box[2] >= extent[2] and box[3] >= extent[3]
+        if geographic:
+            covers = covers or (box[2] - box[0] >= 360 and box[1] <= extent[1] and box[3] >= extent[3])
+        if covers:
+            return halo
+        if len(halo) > k:
+            kth = cKDTree(neighborCoordinates(halo)).query(neighborCoordinates(core), k=k+1)[0][:, -1]
+            if geographic:
+                kth = np.degrees(2 * np.arcsin(np.minimum(kth / 2, 1.0)))
+            if (kth <= _edgeDistance(coreCoords, box, geographic)).all():
+                return halo
+        h *= 2
+
+
+def localMoranTile(path, field, bounds, lastX, lastY, extent, method, knn_dist, zPath, ss, resultsPath, permutations, seed):
+    """Local Moran's I of the features of one tile, run in a worker process.
+
+    Only the tile and its halo of possible neighbors are read from path. The
+    standardization uses the global deviations from the mean (zPath, a .npy
+    file memory mapped by every worker) and their global sum of squares, and
+    the permutations draw from all the features of the layer, so the results
+    are the ones of the monolithic run (permutations = 0: the analytical
+    p-values of localMoranDeviations). They are written to the rows (global
+    ids) of the shared results file. Returns the number of tile features.
+    """
+    candidates = gpd.read_file(path, bbox=bounds)
+    if len(candidates) == 0:
+        return 0
+    core = candidates[_inTile(pointCoordinates(candidates), bounds, lastX, lastY)]
+    if len(core) == 0:
+        return 0
+    coreCoords = pointCoordinates(core)
+    halo = _haloData(path, core, coreCoords, method, knn_dist, extent).reset_index(drop=True)
+
+    zGlobal = np.load(zPath, mmap_mode='r')
+    n = zGlobal.shape[0]
+    ids = halo[ID_FIELD].to_numpy(dtype=np.int64)
+    rows = np.flatnonzero(np.isin(ids, core[ID_FIELD].to_numpy(dtype=np.int64)))
+    coreIds = ids[rows]
+
+    # Row standardized weights of the halo, only the rows of the tile are used
+    W = sparseWeights(halo, method, knn_dist)[rows]
+    rowSums = np.asarray(W.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        W = W.multiply(np.where(rowSums > 0, 1.0 / rowSums, 0.0)[:, None]).tocsr()
+
+    z = np.asarray(zGlobal[coreIds])
+    zLag = W @ np.asarray(zGlobal[ids])
+    scale = (n - 1) * z / ss
+    I = scale * zLag
+    if permutations > 0:
+        pSim, zSim, pZSim = permutationInference(paddedWeights(W), coreIds, zGlobal, zLag, scale, permutations, seed)
+    else:
+        pZSim = localMoranDeviations(z, zLag, np.asarray(W.sum(axis=1)).ravel(), np.asarray(W.multiply(W).sum(axis=1)).ravel(), n, ss)[1]
+
+    results = np.load(resultsPath, mmap_mode='r+')
+    results[coreIds, 0] = I
+    results[coreIds, 1] = pZSim
+    results[coreIds, 2] = quadrants(z, zLag)
+    results.flush()
+    return len(coreIds)
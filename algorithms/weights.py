@@ -0,0 +1,169 @@
+"""
+***************************************************************************
+    weights.py
+    ---------------------
+    Author               : Parmenion Delialis
+    Date                 : October 2026
+    Contact              : parmeniondelialis@gmail.com
+***************************************************************************
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+import libpysal
+import warnings
+
+# Options shared by every algorithm that builds spatial weights
+METHODS = ['Queen contiguity', 'Rook contiguity', 'K Nearest Neighbors', 'Distance Band']
+
+# Mean earth radius (km), distance thresholds of geographic layers are in km
+EARTH_RADIUS = 6371.0088
+
+
+def methodDescription(method, knn_dist):
+    if method == 0: return 'Queen contiguity'
+    elif method == 1: return 'Rook contiguity'
+    elif method == 2: return 'K Nearest Neighbors, KNN = '+str(knn_dist)
+    elif method == 3: return 'Distance Band, Fixed Distance = '+str(knn_dist)
+
+
+def isPolygon(data):
+    return bool(data.geom_type.isin(['Polygon', 'MultiPolygon']).any())
+
+
+def isGeographic(data):
+    return data.crs is not None and data.crs.is_geographic
+
+
+def chordLength(km):
+    # Straight line (unit sphere) length of a great circle distance
+    return 2 * np.sin(np.minimum(km / (2 * EARTH_RADIUS), np.pi / 2))
+
+
+def arcLength(chord):
+    # Great circle distance (km) of a straight line (unit sphere) length
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def buildWeights(data, method, knn_dist):
+    """Spatial weights for a GeoDataFrame, in the row order of the dataframe.
+
+    Queen = 0, Rook = 1, KNN = 2, Distance = 3. KNN and Distance Band use
+    the centroids of polygon layers. For geographic CRSs they use great
+    circle distances (threshold in km), see neighborCoordinates.
+    """
+    if method in (2, 3) and isGeographic(data):
+        return libpysal.weights.WSP(sparseWeights(data, method, knn_dist)).to_W(silence_warnings=True)
+    if method in (2, 3) and isPolygon(data):
+        data = data.set_geometry(data.centroid)
+
+    if method == 0:
+        w = libpysal.weights.contiguity.Queen.from_dataframe(data)
+    elif method == 1:
+        w = libpysal.weights.contiguity.Rook.from_dataframe(data)
+    elif method == 2:
+        w = libpysal.weights.distance.KNN.from_dataframe(data, k=int(knn_dist))
+    elif method == 3:
+        w = libpysal.weights.distance.DistanceBand.from_dataframe(data, threshold=knn_dist, silence_warnings=True)
+    return w
+
+
+def pointCoordinates(data):
+    if isPolygon(data):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)      # Centroids in geographic CRS
+            geometry = data.centroid
+    else:
+        geometry = data.geometry
+    return np.column_stack([geometry.x.to_numpy(), geometry.y.to_numpy()])
+
+
+def neighborCoordinates(data):
+    """Coordinates for the neighbor searches of KNN and Distance Band.
+
+    Planar layers: the (centroid) x, y. Geographic layers: points on the unit
+    sphere, so that KD-tree (straight line) distances rank neighbors as the
+    great circle distances, with thresholds from chordLength. No reprojection.
+    """
+    coords = pointCoordinates(data)
+    if not isGeographic(data):
+        return coords
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def searchRadius(data, threshold):
+    # Distance band threshold in the units of neighborCoordinates
+    return chordLength(threshold) if isGeographic(data) else threshold
+
+
+def binaryMatrix(rows, cols, n):
+    W = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    W.data[:] = 1.0
+    W.sort_indices()
+    return W
+
+
+def knnPairs(coords, tree, rows, k):
+    # k nearest neighbors of the given rows, excluding the feature itself
+    if len(rows) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    k = min(k, coords.shape[0] - 1)
+    d, idx = tree.query(coords[rows], k=k+1)
+    idx = idx.reshape(len(rows), k+1)
+    keep = idx != rows[:, None]
+    noSelf = keep.all(axis=1)
+    keep[noSelf, -1] = False
+    return np.repeat(rows, k), idx[keep]
+
+
+def distancePairs(coords, tree, rows, threshold):
+    # Features within the threshold of the given rows, in both directions
+    if len(rows) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    near = tree.query_ball_point(coords[rows], r=threshold, return_sorted=False)
+    r = np.repeat(rows, [len(c) for c in near])
+    c = np.concatenate([np.asarray(c, dtype=int) for c in near])
+    keep = r != c
+    return np.concatenate([r[keep], c[keep]]), np.concatenate([c[keep], r[keep]])
+
+
+def contiguityPairs(data, rows, method):
+    # Contiguity of the given rows, from the weights of the features around them
+    if len(rows) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    near = data.sindex.query(data.geometry.values[rows], predicate='intersects')[1]
+    candidates = np.union1d(near, rows)
+    subset = data.iloc[candidates].reset_index(drop=True)
+    if method == 0:
+        w = libpysal.weights.contiguity.Queen.from_dataframe(subset)
+    else:
+        w = libpysal.weights.contiguity.Rook.from_dataframe(subset)
+    S = w.sparse.tocoo()
+    r, c = candidates[S.row], candidates[S.col]
+    keep = np.isin(r, rows) | np.isin(c, rows)
+    return r[keep], c[keep]
+
+
+def sparseWeights(data, method, knn_dist):
+    """Binary sparse weights built directly from the geometries, Queen = 0, Rook = 1, KNN = 2, Distance = 3.
+
+    KNN and Distance Band come from a KD-tree on the (centroid) coordinates, or
+    on the unit sphere for geographic layers, so the neighbors of any subset of
+    features can be searched again with the same rules (see knnPairs,
+    distancePairs and contiguityPairs).
+    """
+    n = data.shape[0]
+    if method == 0 or method == 1:
+        w = libpysal.weights.contiguity.Queen.from_dataframe(data) if method == 0 else libpysal.weights.contiguity.Rook.from_dataframe(data)
+        S = w.sparse.tocoo()
+        r, c = S.row, S.col
+    else:
+        coords = neighborCoordinates(data)
+        tree = cKDTree(coords)
+        if method == 2:
+            r, c = knnPairs(coords, tree, np.arange(n), int(knn_dist))
+        else:
+            r, c = distancePairs(coords, tree, np.arange(n), searchRadius(data, knn_dist))
+    return binaryMatrix(r, c, n)
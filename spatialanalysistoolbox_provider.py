@@ -33,12 +33,19 @@ from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
 from .algorithms.CloneLayer import CloneLayer
 from .algorithms.GWR_ import GWR_
+from .algorithms.MGWR_ import MGWR_
+from .algorithms.GWRSelection import GWRSelection
 from .algorithms.LocalMoransI import LocalMoransI
 from .algorithms.MoransI import MoransI
 from .algorithms.CorrelationMatrix import CorrelationMatrix
 from .algorithms.LocationQuotient import LocationQuotient
 from .algorithms.EntropyIndex import EntropyIndex
 from .algorithms.DummyVariables import DummyVariables
+from .algorithms.GetisOrdGi import GetisOrdGi
+from .algorithms.BivariateLocalMoransI import BivariateLocalMoransI
+from .algorithms.SpatialRegression import SpatialRegression
+from .algorithms.LocalDiversity import LocalDiversity
+from .algorithms.RasterMoransI import RasterMoransI
 
 class SpatialAnalysisToolboxProvider(QgsProcessingProvider):
 
@@ -51,12 +58,19 @@ class SpatialAnalysisToolboxProvider(QgsProcessingProvider):
     def loadAlgorithms(self):
         self.addAlgorithm(CloneLayer())
         self.addAlgorithm(GWR_())
+        self.addAlgorithm(MGWR_())
+        self.addAlgorithm(GWRSelection())
         self.addAlgorithm(LocalMoransI())
         self.addAlgorithm(MoransI())
         self.addAlgorithm(CorrelationMatrix())
         self.addAlgorithm(LocationQuotient())
         self.addAlgorithm(EntropyIndex())
         self.addAlgorithm(DummyVariables())
+        self.addAlgorithm(GetisOrdGi())
+        self.addAlgorithm(BivariateLocalMoransI())
+        self.addAlgorithm(SpatialRegression())
+        self.addAlgorithm(LocalDiversity())
+        self.addAlgorithm(RasterMoransI())
 
     def id(self):
         return 'sat'